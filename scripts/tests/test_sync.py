@@ -0,0 +1,177 @@
+import os
+from typing import List
+
+import pytest
+import yaml
+from pathspec import PathSpec
+
+from scripts.validate_and_create_manifest.stores import (
+    LocalDirectoryStore,
+    RemoteObject,
+    get_bytes_md5,
+)
+from scripts.validate_and_create_manifest.sync import (
+    S3_TEMPLATES_PREFIX,
+    S3_TEMPLATES_SRC_PREFIX,
+    TemplateSync,
+)
+
+MANIFEST_KEY = f"{S3_TEMPLATES_PREFIX}/manifest.yml"
+
+
+class RecordingStore(LocalDirectoryStore):
+    """Local store recording the keys of all uploads and deletions in order."""
+
+    def __init__(self, root: str) -> None:
+        super().__init__(root)
+        self.uploads: List[str] = []
+        self.deletions: List[str] = []
+
+    def upload_file(self, key: str, path: str) -> RemoteObject:
+        self.uploads.append(key)
+        return super().upload_file(key, path)
+
+    def put_object(self, key: str, body: bytes) -> RemoteObject:
+        self.uploads.append(key)
+        return super().put_object(key, body)
+
+    def delete_object(self, key: str) -> None:
+        self.deletions.append(key)
+        super().delete_object(key)
+
+
+def write_file(path, content: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+
+
+@pytest.fixture
+def templates_dir(tmp_path):
+    root = tmp_path / "src"
+    write_file(root / "agent-a" / "agent.yml", "template: a\n")
+    write_file(root / "agent-a" / "main.py", "print('a')\n")
+    write_file(root / "agent-b" / "agent.yml", "template: b\n")
+    write_file(root / "agent-b" / "helpers" / "tools.py", "print('b')\n")
+    return root
+
+
+@pytest.fixture
+def manifest_path(tmp_path):
+    path = tmp_path / "manifest.yml"
+    write_file(path, "agent_templates:\n- id: agent-a\n- id: agent-b\n")
+    return str(path)
+
+
+def create_sync(store, templates_dir, **kwargs) -> TemplateSync:
+    return TemplateSync(
+        store,
+        PathSpec.from_lines("gitwildmatch", []),
+        templates_dir=str(templates_dir),
+        jobs=4,
+        **kwargs,
+    )
+
+
+def sync(store, templates_dir, manifest_path, **kwargs):
+    return create_sync(store, templates_dir, **kwargs).sync(
+        ["agent-a", "agent-b"], [manifest_path]
+    )
+
+
+def test_uploads_templates_version_manifests_and_manifest(
+    tmp_path, templates_dir, manifest_path
+):
+    store = RecordingStore(str(tmp_path / "store"))
+
+    result = sync(store, templates_dir, manifest_path)
+
+    template_keys = [
+        f"{S3_TEMPLATES_SRC_PREFIX}/agent-a/agent.yml",
+        f"{S3_TEMPLATES_SRC_PREFIX}/agent-a/main.py",
+        f"{S3_TEMPLATES_SRC_PREFIX}/agent-b/agent.yml",
+        f"{S3_TEMPLATES_SRC_PREFIX}/agent-b/helpers/tools.py",
+    ]
+    version_manifest_keys = [
+        f"{S3_TEMPLATES_PREFIX}/agent-a.manifest.yml",
+        f"{S3_TEMPLATES_PREFIX}/agent-b.manifest.yml",
+    ]
+    assert result.uploaded == sorted(template_keys + version_manifest_keys + [MANIFEST_KEY])
+    assert result.unchanged == []
+    assert result.deleted == []
+    remote = store.list_objects(f"{S3_TEMPLATES_PREFIX}/")
+    assert remote[f"{S3_TEMPLATES_SRC_PREFIX}/agent-a/main.py"].md5 == get_bytes_md5(
+        b"print('a')\n"
+    )
+    with open(os.path.join(store.root, *version_manifest_keys[1].split("/"))) as f:
+        version_manifest = yaml.safe_load(f)
+    assert version_manifest == {
+        "objects": [
+            {"key": key, "version_id": remote[key].version_id}
+            for key in template_keys[2:]
+        ]
+    }
+
+
+def test_skips_unchanged_objects(tmp_path, templates_dir, manifest_path):
+    store = RecordingStore(str(tmp_path / "store"))
+    sync(store, templates_dir, manifest_path)
+    store.uploads.clear()
+
+    result = sync(store, templates_dir, manifest_path)
+
+    assert store.uploads == []
+    assert result.uploaded == []
+    assert MANIFEST_KEY in result.unchanged
+    assert f"{S3_TEMPLATES_SRC_PREFIX}/agent-a/main.py" in result.unchanged
+
+
+def test_uploads_changed_and_deletes_removed_files(
+    tmp_path, templates_dir, manifest_path
+):
+    store = RecordingStore(str(tmp_path / "store"))
+    sync(store, templates_dir, manifest_path)
+    store.uploads.clear()
+    write_file(templates_dir / "agent-a" / "main.py", "print('changed')\n")
+    os.remove(templates_dir / "agent-b" / "helpers" / "tools.py")
+
+    result = sync(store, templates_dir, manifest_path)
+
+    # Version manifests change with the versions of the files of their template
+    assert result.uploaded == [
+        f"{S3_TEMPLATES_PREFIX}/agent-a.manifest.yml",
+        f"{S3_TEMPLATES_PREFIX}/agent-b.manifest.yml",
+        f"{S3_TEMPLATES_SRC_PREFIX}/agent-a/main.py",
+    ]
+    assert result.deleted == [f"{S3_TEMPLATES_SRC_PREFIX}/agent-b/helpers/tools.py"]
+    assert store.deletions == result.deleted
+    assert f"{S3_TEMPLATES_SRC_PREFIX}/agent-b/helpers/tools.py" not in store.list_objects(
+        f"{S3_TEMPLATES_PREFIX}/"
+    )
+
+
+def test_uploads_manifest_last(tmp_path, templates_dir, manifest_path):
+    store = RecordingStore(str(tmp_path / "store"))
+    sync(store, templates_dir, manifest_path)
+    assert store.uploads[-1] == MANIFEST_KEY
+
+    # Also if only the manifest and a template file changed
+    store.uploads.clear()
+    write_file(manifest_path, "agent_templates:\n- id: agent-a\n- id: agent-b\n# changed\n")
+    write_file(templates_dir / "agent-b" / "agent.yml", "template: changed\n")
+    sync(store, templates_dir, manifest_path)
+    assert store.uploads[-1] == MANIFEST_KEY
+    assert set(store.uploads[:-1]) == {
+        f"{S3_TEMPLATES_SRC_PREFIX}/agent-b/agent.yml",
+        f"{S3_TEMPLATES_PREFIX}/agent-b.manifest.yml",
+    }
+
+
+def test_dry_run_does_not_change_the_store(tmp_path, templates_dir, manifest_path):
+    store = RecordingStore(str(tmp_path / "store"))
+
+    result = sync(store, templates_dir, manifest_path, dry_run=True)
+
+    assert MANIFEST_KEY in result.uploaded
+    assert store.uploads == []
+    assert store.list_objects(f"{S3_TEMPLATES_PREFIX}/") == {}
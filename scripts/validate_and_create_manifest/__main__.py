@@ -1,22 +1,60 @@
-from dataclasses import asdict
+from dataclasses import replace
+import argparse
+import json
 import os
 import re
-import json
 import yaml
 import logging
-import jsonschema
 from datetime import datetime, timezone
-from typing import List, Dict, Any, Optional, Tuple, TypedDict
+from typing import (
+    Iterable,
+    List,
+    Dict,
+    Any,
+    NoReturn,
+    Optional,
+    Set,
+    Tuple,
+)
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathspec import PathSpec
 from pathspec.patterns import GitWildMatchPattern
-import subprocess
 
+from .cache import CacheEntry
+from .cache import ValidationCache
+from .cache import get_cache_key
+from .git import RepositoryInfo
+from .git import get_changed_paths
+from .git import get_current_branch
+from .git import get_repository_info
 from .models.exceptions import ValidationErrorType
 from .models.exceptions import ValidationError
 from .models.exceptions import ValidationErrors
+from .models.exceptions import ManifestSizeExceededError
+from .models.exceptions import PathErrorCode
+from .models.exceptions import PathErrors
 from .models.manifest import TemplateInfo
 from .models.manifest import TemplateManifest
+from .packaging import IndexOptions
+from .packaging import get_index_fields
+from .packaging import is_index_complete
+from .packaging import strip_index_fields
+from .scan import FileRecord
+from .stores import LocalDirectoryStore
+from .stores import ObjectStore
+from .stores import S3Store
+from .sync import S3_BUCKET
+from .sync import S3_BUCKET_BRANCH
+from .sync import S3_DEV_BUCKET
+from .sync import TemplateSync
+from .sync import load_manifest_templates
+from .schema import AgentSchema
+from .schema import load_agent_schema
+from .schema import load_yaml
+from .writer import ManifestWriter
+from .scan import scan_template_directory
 
 # Constants
 MAX_MANIFEST_SIZE_BYTES = 1_000_000  # 1MB
@@ -24,10 +62,15 @@ MAX_S3_KEY_LENGTH = 1_024
 S3_PATH_PREFIX = "agent/templates/"
 MAX_PATH_LENGTH = MAX_S3_KEY_LENGTH - len(S3_PATH_PREFIX)
 PATH_SEGMENT_PATTERN = r"^[a-zA-Z0-9-_.]{1,64}$"
+PATH_SEGMENT_REGEX = re.compile(PATH_SEGMENT_PATTERN)
 GITHUB_REPO_URL = "https://github.com/askui/askui-agent-templates"
 IGNORE_FILE_PATHS = {".gitignore"} # only relevant for local validation
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
 AGENT_TEMPLATES_DIR = "src"
+AGENT_SCHEMA_PATH = "agent-schema.yml"
+MANIFEST_YML_PATH = "manifest.yml"
+MANIFEST_JSON_PATH = "manifest.json"
+CACHE_FILE_PATH = ".manifest-cache.json"
 
 # Configure logging
 logging.basicConfig(
@@ -37,52 +80,44 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-class FilePathError(TypedDict, total=False):
-    error: str
-    message: str
-    segment: str
-
-
-def get_last_modified_iso(directory: str) -> str:
-    latest = max(
-        os.path.getmtime(os.path.join(root, file))
-        for root, _, files in os.walk(directory)
-        for file in files
-    )
+def get_last_modified_iso(files: Iterable[FileRecord]) -> str:
+    latest = max(file.mtime for file in files)
     return datetime.fromtimestamp(latest, tz=timezone.utc).isoformat()
 
 
-def validate_path_segment(segment: str) -> Optional[str]:
-    if not re.match(PATH_SEGMENT_PATTERN, segment):
-        return f"Invalid path segment: {segment}. Path segment must match {PATH_SEGMENT_PATTERN}."
-    return None
-
-
-def validate_path(path: str) -> list[FilePathError]:
-    """Validate complete S3 path against AWS restrictions."""
-    path_str = str(path)
-    errors: list[FilePathError] = []
-
-    # Check total path length
-    if len(path_str) > MAX_PATH_LENGTH:
-        errors.append(
-            FilePathError(
-                error="path_too_long",
-                message=f"Path exceeds {MAX_PATH_LENGTH} characters",
-            )
-        )
-
-    # Validate each path component
-    for segment in Path(path_str).parts:
-        if error := validate_path_segment(segment):
-            errors.append(
-                FilePathError(
-                    error="invalid_file_path",
-                    message=error,
-                    segment=segment,
-                )
-            )
+def validate_paths(paths: Iterable[str]) -> PathErrors:
+    """Validate many (relative) paths at once against the S3 key restrictions.
 
+    Paths are split at the separator instead of being parsed as `Path`s and the segments
+    of each unique directory are validated only once, which pays off as files of a
+    template share most of their directories.
+    """
+    errors = PathErrors(
+        max_path_length=MAX_PATH_LENGTH, segment_pattern=PATH_SEGMENT_PATTERN
+    )
+    # Invalid segments of each directory validated so far, including its parents
+    invalid_segments: Dict[str, Tuple[str, ...]] = {"": ()}
+
+    def get_invalid_segments(directory: str) -> Tuple[str, ...]:
+        if (segments := invalid_segments.get(directory)) is not None:
+            return segments
+        parent, _, name = directory.rpartition(os.sep)
+        segments = get_invalid_segments(parent)
+        if not PATH_SEGMENT_REGEX.match(name):
+            segments += (name,)
+        invalid_segments[directory] = segments
+        return segments
+
+    for path in paths:
+        if os.altsep:
+            path = path.replace(os.altsep, os.sep)
+        if len(path) > MAX_PATH_LENGTH:
+            errors.add(path, PathErrorCode.PATH_TOO_LONG)
+        directory, _, name = path.rpartition(os.sep)
+        for segment in get_invalid_segments(directory):
+            errors.add(path, PathErrorCode.INVALID_FILE_PATH, segment)
+        if not PATH_SEGMENT_REGEX.match(name):
+            errors.add(path, PathErrorCode.INVALID_FILE_PATH, name)
     return errors
 
 
@@ -96,124 +131,272 @@ def get_ignore_path_spec() -> PathSpec:
     return PathSpec.from_lines(GitWildMatchPattern, patterns)
 
 
-def validate_template_paths(
-    template_dir: str, ignore_path_spec: PathSpec
-) -> List[ValidationError]:
-    errors: List[ValidationError] = []
-
-    for root, _, files in os.walk(template_dir):
-        if ignore_path_spec.match_file(root):
-            continue
-        for file in files:
-            file_path = os.path.join(root, file)
-            if ignore_path_spec.match_file(file_path):
-                continue
-            relative_path = os.path.relpath(file_path)
-            if _errors := validate_path(relative_path):
-                errors.extend(
-                    ValidationError(
-                        ValidationErrorType.INVALID_FILE_PATH,
-                        f"Invalid path '{relative_path}': {error['message']}",
-                        dict(error),
-                        relative_path,
-                    )
-                    for error in _errors
-                )
-    return errors
+def validate_template_paths(files: Iterable[FileRecord]) -> PathErrors:
+    return validate_paths(file.path for file in files)
 
 
 def load_and_validate_agent_config(
-    agent_yml_path: str, schema: Dict[str, Any]
-) -> Tuple[Optional[Dict[str, Any]], Optional[ValidationError]]:
+    agent_yml_path: str, schema: AgentSchema
+) -> Tuple[Optional[Dict[str, Any]], List[ValidationError]]:
     try:
         with open(agent_yml_path, "r") as f:
-            agent_config = yaml.safe_load(f)
-            jsonschema.validate(agent_config, schema)
-            return agent_config, None
+            agent_config = load_yaml(f)
     except yaml.YAMLError as e:
-        return None, ValidationError(
-            ValidationErrorType.INVALID_YAML,
-            f"Invalid YAML in {agent_yml_path}",
-            {"error": str(e)},
-            agent_yml_path,
-        )
-    except jsonschema.exceptions.ValidationError as e:
-        return None, ValidationError(
+        return None, [
+            ValidationError(
+                ValidationErrorType.INVALID_YAML,
+                f"Invalid YAML in {agent_yml_path}",
+                {"error": str(e)},
+                agent_yml_path,
+            )
+        ]
+
+    errors = [
+        ValidationError(
             ValidationErrorType.SCHEMA_VIOLATION,
-            f"Schema validation failed for {agent_yml_path}",
-            {"error": str(e)},
+            f"Schema validation failed for {agent_yml_path} at {error.json_path}",
+            {"error": error.message, "json_path": error.json_path},
             agent_yml_path,
         )
+        for error in schema.get_errors(agent_config)
+    ]
+    if errors:
+        return None, errors
+    return agent_config, []
 
 
-def get_git_sha() -> str:
-    """Get current git SHA."""
-    try:
-        return (
-            subprocess.check_output(
-                ["git", "rev-parse", "HEAD"], stderr=subprocess.PIPE
-            )
-            .decode("utf-8")
-            .strip()
-        )
-    except subprocess.CalledProcessError as e:
-        raise RuntimeError(
-            f"Failed to get git SHA. Are you in a git repository? Error: {e.stderr.decode('utf-8')}"
-        ) from e
+def is_template_changed(template_dir: str, changed_paths: Set[str]) -> bool:
+    prefix = Path(template_dir).as_posix().rstrip("/") + "/"
+    return any(path.startswith(prefix) for path in changed_paths)
+
+
+def get_template_metadata(
+    template_dir: str,
+    repository: RepositoryInfo,
+    files: Optional[List[FileRecord]] = None,
+) -> Dict[str, Any]:
+    """Get the fields of a `TemplateInfo` that depend on the repository state rather than on the `agent.yml`.
+
+    `last_modified` is the time of the last commit touching the template if last commits
+    were resolved for the repository, otherwise it is derived from the modification times
+    of `files` (and omitted if no files are passed).
+    """
+    metadata: Dict[str, Any] = {
+        "url": f"{GITHUB_REPO_URL}/blob/{repository.sha}/{template_dir}",
+        "last_commit_sha": None,
+    }
+    if commit := repository.get_last_commit(template_dir):
+        metadata["last_modified"] = commit.time
+        metadata["last_commit_sha"] = commit.sha
+    elif files is not None:
+        metadata["last_modified"] = get_last_modified_iso(files)
+    return metadata
 
 
 def create_template_info(
-    template_dir: str, agent_config: Dict[str, Any]
+    template_dir: str,
+    agent_config: Dict[str, Any],
+    files: List[FileRecord],
+    repository: RepositoryInfo,
 ) -> TemplateInfo:
     return TemplateInfo(
         id=os.path.basename(os.path.normpath(template_dir)),
-        url=f"{GITHUB_REPO_URL}/blob/{get_git_sha()}/{template_dir}",
-        last_modified=get_last_modified_iso(template_dir),
         name=agent_config["template"]["name"],
         description=agent_config["template"]["description"],
+        **get_template_metadata(template_dir, repository, files),
     )
 
 
-def validate_template_directory(
-    template_dir: str, schema: Dict[str, Any], ignore_path_spec: PathSpec
-) -> Tuple[Optional[TemplateInfo], List[ValidationError]]:
-    logger.info(f"Validating template directory: {template_dir}")
-    errors: List[ValidationError] = []
-    errors.extend(validate_template_paths(template_dir, ignore_path_spec))
-    if errors:
+def validate_template_files(
+    template_dir: str,
+    files: List[FileRecord],
+    schema: AgentSchema,
+    repository: RepositoryInfo,
+) -> Tuple[Optional[TemplateInfo], ValidationErrors]:
+    errors = ValidationErrors()
+    errors.add_path_errors(validate_template_paths(files))
+    if errors.has_errors():
         return None, errors
 
     agent_yml_path = os.path.join(template_dir, "agent.yml")
-    agent_config, error = load_and_validate_agent_config(agent_yml_path, schema)
-    if error or not agent_config:
-        if error:
-            errors.append(error)
+    agent_config, config_errors = load_and_validate_agent_config(agent_yml_path, schema)
+    errors.extend(config_errors)
+    if errors.has_errors() or not agent_config:
         return None, errors
 
     logger.info(f"Template directory {template_dir} is valid")
-    template_info = create_template_info(template_dir, agent_config)
+    template_info = create_template_info(template_dir, agent_config, files, repository)
     logger.debug(f"Template info: {template_info}")
-    return template_info, []
+    return template_info, errors
+
+
+def validate_template_directory_cached(
+    template_dir: str,
+    schema: AgentSchema,
+    ignore_path_spec: PathSpec,
+    repository: RepositoryInfo,
+    cache_entry: Optional[CacheEntry],
+    index_options: IndexOptions = IndexOptions(),
+) -> CacheEntry:
+    """Validate a template directory unless `cache_entry` holds the result for its current content.
+
+    If requested by `index_options`, the template info of a valid template is extended
+    by a file index and/or an archive of the template.
+    """
+    files = list(scan_template_directory(template_dir, ignore_path_spec))
+    key = get_cache_key(
+        os.path.join(template_dir, "agent.yml"),
+        files,
+        include_file_stats=index_options.enabled,
+    )
+    if (
+        cache_entry
+        and cache_entry.key == key
+        and (
+            cache_entry.template_info is None
+            or is_index_complete(cache_entry.template_info, index_options)
+        )
+    ):
+        logger.info(
+            f"Template directory {template_dir} is unchanged, using cached result"
+        )
+        template_info = cache_entry.template_info and replace(
+            strip_index_fields(cache_entry.template_info, index_options),
+            **get_template_metadata(template_dir, repository, files),
+        )
+        return CacheEntry(
+            key=key, template_info=template_info, errors=cache_entry.errors
+        )
 
+    logger.info(f"Validating template directory: {template_dir}")
+    template_info, errors = validate_template_files(
+        template_dir, files, schema, repository
+    )
+    if template_info and index_options.enabled:
+        template_info = replace(
+            template_info,
+            **get_index_fields(template_info.id, files, index_options),
+        )
+    return CacheEntry(key=key, template_info=template_info, errors=errors)
+
+
+def write_manifest(
+    manifest: TemplateManifest,
+    json_path: Optional[str] = None,
+    gzip_compressed: bool = False,
+) -> None:
+    with ManifestWriter(
+        MANIFEST_YML_PATH,
+        json_path=json_path,
+        gzip_compressed=gzip_compressed,
+        max_size=MAX_MANIFEST_SIZE_BYTES,
+    ) as writer:
+        for template_info in manifest.agent_templates:
+            writer.write(template_info)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m scripts.validate_and_create_manifest",
+        description="Validate agent templates and create manifest.yml",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes used to validate templates (0 = number of CPUs, default: 1)",
+    )
+    parser.add_argument(
+        "--cache-file",
+        default=CACHE_FILE_PATH,
+        help=f"Path of the validation cache (default: {CACHE_FILE_PATH})",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Validate all templates without reading or writing the validation cache",
+    )
+    parser.add_argument(
+        "--changed-since",
+        metavar="GIT_REF",
+        help="Only validate templates changed since GIT_REF; results of all other templates are taken from the validation cache",
+    )
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help=f"Additionally write a compact {MANIFEST_JSON_PATH}",
+    )
+    parser.add_argument(
+        "--gzip",
+        action="store_true",
+        help="Additionally write gzip compressed variants (.gz) of the manifest files",
+    )
+    parser.add_argument(
+        "--file-index",
+        action="store_true",
+        help="Add the path, size and SHA-256 hash of every file of a template to the manifest",
+    )
+    parser.add_argument(
+        "--archive-dir",
+        metavar="DIR",
+        help="Package each template into a reproducible, content-addressed archive in DIR and add it to the manifest",
+    )
+    parser.add_argument(
+        "--last-modified",
+        choices=["mtime", "git"],
+        default="mtime",
+        help="Derive last_modified of templates from file modification times or from the last commit touching them (default: mtime)",
+    )
 
-def get_manifest_size(manifest: TemplateManifest) -> int:
-    return len(json.dumps(asdict(manifest)).encode("utf-8"))
+    parser.add_argument(
+        "--format",
+        choices=["text", "json"],
+        default="text",
+        help="Format of reported validation errors; json prints them to stdout (default: text)",
+    )
 
+    subparsers = parser.add_subparsers(dest="command", metavar="COMMAND")
+    sync_parser = subparsers.add_parser(
+        "sync",
+        help=f"Sync the templates listed in {MANIFEST_YML_PATH} to S3",
+        description=f"Sync the templates listed in {MANIFEST_YML_PATH}, their version manifests and the manifest files to S3 or a local directory. Only changed files are uploaded.",
+    )
+    sync_parser.add_argument(
+        "--bucket",
+        help=f"S3 bucket to sync to (default: {S3_BUCKET} on branch {S3_BUCKET_BRANCH}, {S3_DEV_BUCKET} otherwise)",
+    )
+    sync_parser.add_argument(
+        "--store-dir",
+        metavar="DIR",
+        help="Sync to a local directory instead of S3, e.g., for testing",
+    )
+    sync_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=8,
+        help="Maximum number of concurrent uploads (default: 8)",
+    )
+    sync_parser.add_argument(
+        "--archive-dir",
+        metavar="DIR",
+        help="Directory containing the template archives referenced by the manifest, which are uploaded as well",
+    )
+    sync_parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only log what would be uploaded and deleted",
+    )
 
-def main() -> None:
-    logger.info("Starting template validation")
-    validation_errors = ValidationErrors()
-    try:
-        with open("agent-schema.yml", "r") as f:
-            schema = yaml.safe_load(f)
-    except Exception as e:
-        raise RuntimeError(
-            f"Failed to load agent-schema.yml: {e}. Are you sure you are running this script from the root of the agent-templates repository?"
-        ) from e
+    args = parser.parse_args(argv)
+    if args.no_cache and args.changed_since:
+        parser.error("--changed-since cannot be used together with --no-cache")
+    return args
 
-    ignore_path_spec = get_ignore_path_spec()
-    manifest = TemplateManifest(agent_templates=[])
 
+def get_template_directories() -> List[str]:
+    template_dirs: List[str] = []
     for _dir in os.listdir(AGENT_TEMPLATES_DIR):
         dir = os.path.join(AGENT_TEMPLATES_DIR, _dir)
         if not os.path.isdir(dir):
@@ -225,33 +408,221 @@ def main() -> None:
             logger.debug(f"Skipping {dir}: no agent.yml found")
             continue
 
-        template_info, errors = validate_template_directory(
-            template_dir=dir,
-            schema=schema,
-            ignore_path_spec=ignore_path_spec,
+        template_dirs.append(dir)
+    return template_dirs
+
+
+def validate_template_directories(
+    template_dirs: List[str],
+    schema: AgentSchema,
+    ignore_path_spec: PathSpec,
+    repository: RepositoryInfo,
+    jobs: int = 1,
+    cache: Optional[ValidationCache] = None,
+    changed_since: Optional[str] = None,
+    index_options: IndexOptions = IndexOptions(),
+) -> List[Tuple[Optional[TemplateInfo], ValidationErrors]]:
+    """Validate template directories, optionally fanned out across a process pool.
+
+    Results are returned in the order of `template_dirs` regardless of `jobs` so
+    that the manifest and the reported errors are the same as for a serial run.
+
+    If a `cache` is passed, templates whose content did not change are served from it
+    and it is updated with the results. If, in addition, `changed_since` is passed,
+    templates not touched since that git ref are served from the cache without even
+    scanning them.
+    """
+    changed_paths = get_changed_paths(changed_since) if changed_since else None
+    entries: List[Optional[CacheEntry]] = [None] * len(template_dirs)
+    pending: List[int] = []
+    for i, template_dir in enumerate(template_dirs):
+        cache_entry = cache.get(template_dir) if cache else None
+        if (
+            cache_entry
+            and changed_paths is not None
+            and not is_template_changed(template_dir, changed_paths)
+            and (
+                cache_entry.template_info is None
+                or is_index_complete(cache_entry.template_info, index_options)
+            )
+        ):
+            logger.info(
+                f"Template directory {template_dir} is unchanged since {changed_since}, using cached result"
+            )
+            template_info = cache_entry.template_info and replace(
+                strip_index_fields(cache_entry.template_info, index_options),
+                **get_template_metadata(template_dir, repository),
+            )
+            entries[i] = replace(cache_entry, template_info=template_info)
+        else:
+            pending.append(i)
+
+    pending_dirs = [template_dirs[i] for i in pending]
+    pending_cache_entries = [cache.get(d) if cache else None for d in pending_dirs]
+    if jobs <= 0:
+        jobs = os.cpu_count() or 1
+    jobs = min(jobs, len(pending_dirs))
+    if jobs <= 1:
+        results = list(
+            map(
+                validate_template_directory_cached,
+                pending_dirs,
+                repeat(schema),
+                repeat(ignore_path_spec),
+                repeat(repository),
+                pending_cache_entries,
+                repeat(index_options),
+            )
         )
-        validation_errors.extend(errors)
+    else:
+        logger.info(f"Validating {len(pending_dirs)} templates using {jobs} processes")
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = list(
+                executor.map(
+                    validate_template_directory_cached,
+                    pending_dirs,
+                    repeat(schema),
+                    repeat(ignore_path_spec),
+                    repeat(repository),
+                    pending_cache_entries,
+                    repeat(index_options),
+                    chunksize=max(1, len(pending_dirs) // (jobs * 4)),
+                )
+            )
+    for i, entry in zip(pending, results):
+        entries[i] = entry
+
+    validated: List[Tuple[Optional[TemplateInfo], ValidationErrors]] = []
+    for template_dir, entry in zip(template_dirs, entries):
+        assert entry is not None
+        if cache:
+            cache.set(template_dir, entry)
+        validated.append((entry.template_info, entry.errors))
+    return validated
+
+
+def get_object_store(args: argparse.Namespace) -> ObjectStore:
+    if args.store_dir:
+        return LocalDirectoryStore(args.store_dir)
+    bucket = args.bucket or (
+        S3_BUCKET if get_current_branch() == S3_BUCKET_BRANCH else S3_DEV_BUCKET
+    )
+    return S3Store(bucket)
+
+
+def sync(args: argparse.Namespace) -> None:
+    logger.info("Starting template sync")
+    templates = load_manifest_templates(MANIFEST_YML_PATH)
+    template_ids = [
+        template["id"]
+        for template in templates
+        if os.path.isdir(os.path.join(AGENT_TEMPLATES_DIR, template["id"]))
+    ]
+    archive_paths = {
+        template["archive"]["name"]: os.path.join(
+            args.archive_dir, template["archive"]["name"]
+        )
+        for template in templates
+        if args.archive_dir and template.get("archive")
+    }
+    manifest_paths = [
+        path
+        for path in (
+            f"{MANIFEST_YML_PATH}.gz",
+            MANIFEST_JSON_PATH,
+            f"{MANIFEST_JSON_PATH}.gz",
+        )
+        if os.path.exists(path)
+    ] + [MANIFEST_YML_PATH]
+
+    template_sync = TemplateSync(
+        store=get_object_store(args),
+        ignore_path_spec=get_ignore_path_spec(),
+        templates_dir=AGENT_TEMPLATES_DIR,
+        jobs=args.jobs,
+        dry_run=args.dry_run,
+    )
+    result = template_sync.sync(template_ids, manifest_paths, archive_paths)
+    logger.info(
+        f"Sync finished: {len(result.uploaded)} uploaded, {len(result.deleted)} deleted, {len(result.unchanged)} unchanged"
+    )
+
+
+def raise_validation_errors(
+    validation_errors: ValidationErrors, output_format: str
+) -> NoReturn:
+    if output_format == "json":
+        print(json.dumps(validation_errors.to_dict(), indent=2))
+        raise SystemExit(1)
+    raise ValueError(validation_errors.get_formatted_errors())
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    if args.command == "sync":
+        sync(args)
+        return
+
+    logger.info("Starting template validation")
+    validation_errors = ValidationErrors()
+    try:
+        schema = load_agent_schema(AGENT_SCHEMA_PATH)
+    except Exception as e:
+        raise RuntimeError(
+            f"Failed to load {AGENT_SCHEMA_PATH}: {e}. Are you sure you are running this script from the root of the agent-templates repository?"
+        ) from e
+
+    ignore_path_spec = get_ignore_path_spec()
+    manifest = TemplateManifest(agent_templates=[])
+    cache = (
+        None if args.no_cache else ValidationCache.load(args.cache_file, schema.hash)
+    )
+
+    template_dirs = get_template_directories()
+    repository = get_repository_info(
+        template_dirs, with_last_commits=args.last_modified == "git"
+    )
+    results = validate_template_directories(
+        template_dirs=template_dirs,
+        schema=schema,
+        ignore_path_spec=ignore_path_spec,
+        repository=repository,
+        jobs=args.jobs,
+        cache=cache,
+        changed_since=args.changed_since,
+        index_options=IndexOptions(
+            file_index=args.file_index, archive_dir=args.archive_dir
+        ),
+    )
+    if cache:
+        cache.save()
+    for template_info, errors in results:
+        validation_errors.merge(errors)
         if template_info:
             manifest.agent_templates.append(template_info)
 
-    # Validate manifest size
-    manifest_size = get_manifest_size(manifest)
-    if manifest_size > MAX_MANIFEST_SIZE_BYTES:
+    if validation_errors.has_errors():
+        raise_validation_errors(validation_errors, args.format)
+
+    logger.info("Validation successful!")
+
+    logger.info(f"Creating {MANIFEST_YML_PATH}")
+    try:
+        write_manifest(
+            manifest,
+            json_path=MANIFEST_JSON_PATH if args.json else None,
+            gzip_compressed=args.gzip,
+        )
+    except ManifestSizeExceededError as e:
+        # Validate manifest size
         validation_errors.add(
             ValidationError(
                 ValidationErrorType.MANIFEST_FILE_SIZE_EXCEEDED,
-                f"Manifest file size ({manifest_size} bytes) exceeds maximum size of {MAX_MANIFEST_SIZE_BYTES} bytes",
+                str(e),
+                path=e.path,
             )
         )
-
-    if validation_errors.has_errors():
-        raise ValueError(validation_errors.get_formatted_errors())
-
-    logger.info("Validation successful!")
-
-    logger.info("Creating manifest.yml")
-    with open("manifest.yml", "w") as f:
-        yaml.dump(asdict(manifest), f)
+        raise_validation_errors(validation_errors, args.format)
 
     logger.info("Manifest created")
 
@@ -0,0 +1,355 @@
+"""Benchmark of the stages of validating agent templates and creating the manifest.
+
+Generates a synthetic repository and times each stage of the pipeline on it, e.g.,
+
+    python -m scripts.validate_and_create_manifest.benchmark --templates 200 --files 50 --output bench.json
+
+The results are written as JSON so that they can be compared between versions.
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import yaml
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None  # type: ignore[assignment]
+
+from .__main__ import AGENT_SCHEMA_PATH
+from .__main__ import AGENT_TEMPLATES_DIR
+from .__main__ import get_ignore_path_spec
+from .__main__ import get_template_directories
+from .__main__ import get_template_metadata
+from .__main__ import load_and_validate_agent_config
+from .__main__ import validate_template_directories
+from .__main__ import validate_template_paths
+from .git import RepositoryInfo
+from .models.manifest import TemplateInfo
+from .scan import NESTED_IGNORE_FILE_NAME
+from .scan import scan_template_directory
+from .schema import load_agent_schema
+from .writer import ManifestWriter
+
+BENCHMARK_VERSION = 1
+# Stands in for the git SHA as the synthetic repository is not a git repository
+SYNTHETIC_SHA = "0" * 40
+IGNORED_DIR_NAME = "node_modules"
+NESTED_IGNORED_DIR_NAME = "build"
+INVALID_FILE_NAME = "invalid file name.txt"
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class SyntheticRepoOptions:
+    templates: int = 100
+    files: int = 20
+    """Number of (not ignored) files per template, including `agent.yml`"""
+    depth: int = 3
+    """Depth of the directory tree files of a template are distributed across"""
+    ignored_files: int = 10
+    """Number of files per template in ignored directories"""
+    invalid_ratio: float = 0.1
+    """Share of templates containing a file with an invalid path segment"""
+    file_size: int = 256
+
+
+def generate_synthetic_repo(root: str, options: SyntheticRepoOptions) -> None:
+    """Generate a repository with agent templates below `root`.
+
+    Each template has a valid `agent.yml`, files spread across nested directories, a
+    directory ignored by the root `.gitignore` and one ignored by a nested `.gitignore`.
+    Every `1 / invalid_ratio`-th template contains a file with an invalid path segment.
+    """
+    shutil.copyfile(AGENT_SCHEMA_PATH, os.path.join(root, AGENT_SCHEMA_PATH))
+    with open(os.path.join(root, ".gitignore"), "w") as f:
+        f.write(f"{IGNORED_DIR_NAME}/\n*.pyc\n")
+
+    content = b"x" * options.file_size
+    invalid_every = round(1 / options.invalid_ratio) if options.invalid_ratio else 0
+    for i in range(options.templates):
+        template_dir = os.path.join(root, AGENT_TEMPLATES_DIR, f"template-{i:05d}")
+        os.makedirs(template_dir)
+        with open(os.path.join(template_dir, "agent.yml"), "w") as f:
+            yaml.safe_dump(
+                {
+                    "template": {
+                        "name": f"Template {i}",
+                        "description": f"Synthetic template {i}",
+                    },
+                    "entrypoint": "python main.py",
+                },
+                f,
+            )
+        with open(os.path.join(template_dir, NESTED_IGNORE_FILE_NAME), "w") as f:
+            f.write(f"{NESTED_IGNORED_DIR_NAME}/\n")
+
+        for j in range(options.files - 2):
+            segments = [f"dir-{(j + k) % 4}" for k in range(j % (options.depth + 1))]
+            directory = os.path.join(template_dir, *segments)
+            os.makedirs(directory, exist_ok=True)
+            with open(os.path.join(directory, f"file-{j}.py"), "wb") as f:
+                f.write(content)
+
+        for j in range(options.ignored_files):
+            ignored_dir = IGNORED_DIR_NAME if j % 2 else NESTED_IGNORED_DIR_NAME
+            directory = os.path.join(template_dir, ignored_dir, f"package-{j % 3}")
+            os.makedirs(directory, exist_ok=True)
+            with open(os.path.join(directory, f"file-{j}.js"), "wb") as f:
+                f.write(content)
+
+        if invalid_every and i % invalid_every == 0:
+            with open(os.path.join(template_dir, INVALID_FILE_NAME), "wb") as f:
+                f.write(content)
+
+
+@contextlib.contextmanager
+def _working_directory(path: str) -> Iterator[None]:
+    cwd = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(cwd)
+
+
+def _measure(func: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    """Time `func` `repeat` times and, in an additional run, trace its peak memory usage.
+
+    Memory is traced separately as tracing slows down the traced code considerably.
+    """
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "seconds_min": min(durations),
+        "seconds_median": statistics.median(durations),
+        "peak_memory_bytes": peak,
+    }
+
+
+def _get_max_rss_bytes() -> Optional[int]:
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS but in kilobytes on Linux
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def run_benchmark(root: str, repeat: int = 3, jobs: int = 1) -> Dict[str, Any]:
+    """Run every stage of the pipeline on the repository at `root` and measure it.
+
+    Stages are run one after another on all templates, each using the output of the
+    previous stages, so that their cost can be told apart. `pipeline` measures the
+    validation of all templates as done by the script (without the cache).
+    """
+    with _working_directory(root):
+        schema = load_agent_schema(AGENT_SCHEMA_PATH)
+        ignore_path_spec = get_ignore_path_spec()
+        template_dirs = get_template_directories()
+        repository = RepositoryInfo(sha=SYNTHETIC_SHA)
+        files = {
+            template_dir: list(scan_template_directory(template_dir, ignore_path_spec))
+            for template_dir in template_dirs
+        }
+        template_infos = [
+            TemplateInfo(
+                id=os.path.basename(template_dir),
+                name=os.path.basename(template_dir),
+                description=None,
+                **get_template_metadata(template_dir, repository, files[template_dir]),
+            )
+            for template_dir in template_dirs
+        ]
+        manifest_dir = tempfile.mkdtemp(prefix="manifest-benchmark-")
+
+        def walk() -> None:
+            for template_dir in template_dirs:
+                list(scan_template_directory(template_dir, ignore_path_spec))
+
+        def validate_paths() -> None:
+            for template_dir in template_dirs:
+                validate_template_paths(files[template_dir])
+
+        def validate_schema() -> None:
+            for template_dir in template_dirs:
+                load_and_validate_agent_config(
+                    os.path.join(template_dir, "agent.yml"), schema
+                )
+
+        def metadata() -> None:
+            for template_dir in template_dirs:
+                get_template_metadata(template_dir, repository, files[template_dir])
+
+        def write_manifest() -> None:
+            with ManifestWriter(
+                os.path.join(manifest_dir, "manifest.yml"),
+                json_path=os.path.join(manifest_dir, "manifest.json"),
+            ) as writer:
+                for template_info in template_infos:
+                    writer.write(template_info)
+
+        def pipeline() -> None:
+            validate_template_directories(
+                template_dirs, schema, ignore_path_spec, repository, jobs=jobs
+            )
+
+        try:
+            stages = {
+                name: _measure(func, repeat)
+                for name, func in (
+                    ("walk", walk),
+                    ("validate_paths", validate_paths),
+                    ("validate_schema", validate_schema),
+                    ("metadata", metadata),
+                    ("write_manifest", write_manifest),
+                    ("pipeline", pipeline),
+                )
+            }
+        finally:
+            shutil.rmtree(manifest_dir)
+
+        return {
+            "templates": len(template_dirs),
+            "files": sum(len(f) for f in files.values()),
+            "path_errors": sum(len(validate_template_paths(f)) for f in files.values()),
+            "stages": stages,
+        }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    defaults = SyntheticRepoOptions()
+    parser = argparse.ArgumentParser(
+        prog="python -m scripts.validate_and_create_manifest.benchmark",
+        description="Benchmark validating agent templates and creating the manifest on a synthetic repository",
+    )
+    parser.add_argument(
+        "--templates",
+        type=int,
+        default=defaults.templates,
+        help=f"Number of templates (default: {defaults.templates})",
+    )
+    parser.add_argument(
+        "--files",
+        type=int,
+        default=defaults.files,
+        help=f"Number of files per template (default: {defaults.files})",
+    )
+    parser.add_argument(
+        "--depth",
+        type=int,
+        default=defaults.depth,
+        help=f"Maximum directory depth of files within a template (default: {defaults.depth})",
+    )
+    parser.add_argument(
+        "--ignored-files",
+        type=int,
+        default=defaults.ignored_files,
+        help=f"Number of files per template in ignored directories (default: {defaults.ignored_files})",
+    )
+    parser.add_argument(
+        "--invalid-ratio",
+        type=float,
+        default=defaults.invalid_ratio,
+        help=f"Share of templates with an invalid file path (default: {defaults.invalid_ratio})",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="Number of timed runs per stage (default: 3)",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes of the pipeline stage (default: 1)",
+    )
+    parser.add_argument(
+        "--repo-dir",
+        metavar="DIR",
+        help="Generate the synthetic repository in DIR and keep it instead of using a temporary directory",
+    )
+    parser.add_argument(
+        "--output",
+        metavar="FILE",
+        help="Write the results to FILE instead of stdout",
+    )
+    args = parser.parse_args(argv)
+    if args.files < 2:
+        parser.error("--files must be at least 2")
+    if not 0 <= args.invalid_ratio <= 1:
+        parser.error("--invalid-ratio must be between 0 and 1")
+    if args.repo_dir and os.path.exists(args.repo_dir) and os.listdir(args.repo_dir):
+        parser.error(f"{args.repo_dir} is not empty")
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    options = SyntheticRepoOptions(
+        templates=args.templates,
+        files=args.files,
+        depth=args.depth,
+        ignored_files=args.ignored_files,
+        invalid_ratio=args.invalid_ratio,
+    )
+    root = args.repo_dir or tempfile.mkdtemp(prefix="templates-benchmark-")
+    try:
+        os.makedirs(root, exist_ok=True)
+        start = time.perf_counter()
+        generate_synthetic_repo(root, options)
+        logger.info(
+            f"Generated synthetic repository in {root} in {time.perf_counter() - start:.2f}s"
+        )
+        # Logging every template would dominate the measurements
+        logging.getLogger().setLevel(logging.WARNING)
+        results = {
+            "version": BENCHMARK_VERSION,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "options": {
+                **asdict(options),
+                "repeat": args.repeat,
+                "jobs": args.jobs,
+            },
+            **run_benchmark(root, repeat=args.repeat, jobs=args.jobs),
+            "max_rss_bytes": _get_max_rss_bytes(),
+        }
+    finally:
+        if not args.repo_dir:
+            shutil.rmtree(root)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import hashlib
+import json
+import logging
+import os
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterable, Optional
+
+from .models.exceptions import ValidationErrors
+from .models.manifest import TemplateInfo
+from .scan import FileRecord
+
+# Bump whenever the validation logic changes in a way that affects its results
+# so that results of older versions are not served from the cache.
+CACHE_VERSION = 3
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CacheEntry:
+    key: str
+    template_info: Optional[TemplateInfo] = None
+    errors: ValidationErrors = field(default_factory=ValidationErrors)
+
+
+def get_cache_key(
+    agent_yml_path: str, files: Iterable[FileRecord], include_file_stats: bool = False
+) -> str:
+    """Hash everything the validation result of a template depends on.
+
+    This is the content of the `agent.yml` and the listing of (non-ignored) files. The
+    schema is accounted for on the level of the cache file (see `ValidationCache`).
+    If results also depend on the content of all files, e.g., when they include a file
+    index, `include_file_stats` adds the size and modification time of each file.
+    """
+    digest = hashlib.sha256()
+    with open(agent_yml_path, "rb") as f:
+        digest.update(f.read())
+    if include_file_stats:
+        digest.update(b"\0stats")
+    for file in files:
+        digest.update(b"\0")
+        digest.update(file.relative_path.encode("utf-8"))
+        if include_file_stats:
+            digest.update(f"\0{file.size}\0{file.mtime!r}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _entry_to_dict(entry: CacheEntry) -> Dict[str, Any]:
+    return {
+        "key": entry.key,
+        "template_info": asdict(entry.template_info) if entry.template_info else None,
+        "errors": entry.errors.to_dict(),
+    }
+
+
+def _entry_from_dict(data: Dict[str, Any]) -> CacheEntry:
+    template_info = data.get("template_info")
+    return CacheEntry(
+        key=data["key"],
+        template_info=TemplateInfo.from_dict(template_info) if template_info else None,
+        errors=ValidationErrors.from_dict(data.get("errors", {})),
+    )
+
+
+class ValidationCache:
+    """On-disk cache of validation results per template directory.
+
+    The cache is discarded as a whole if it was written by a different version of the
+    validation logic or for a different schema. Only entries set during the current
+    run are written back on `save()` so that removed templates drop out of the cache.
+    """
+
+    def __init__(self, path: str, schema_hash: str) -> None:
+        self.path = path
+        self.schema_hash = schema_hash
+        self._loaded_entries: Dict[str, CacheEntry] = {}
+        self._entries: Dict[str, CacheEntry] = {}
+
+    @classmethod
+    def load(cls, path: str, schema_hash: str) -> "ValidationCache":
+        cache = cls(path, schema_hash)
+        if not os.path.exists(path):
+            logger.debug(f"No validation cache found at {path}")
+            return cache
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+            if (
+                data.get("version") != CACHE_VERSION
+                or data.get("schema_hash") != schema_hash
+            ):
+                logger.info(f"Discarding outdated validation cache at {path}")
+                return cache
+            cache._loaded_entries = {
+                template_dir: _entry_from_dict(entry)
+                for template_dir, entry in data["templates"].items()
+            }
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring invalid validation cache at {path}: {e}")
+        return cache
+
+    def get(self, template_dir: str) -> Optional[CacheEntry]:
+        return self._loaded_entries.get(template_dir)
+
+    def set(self, template_dir: str, entry: CacheEntry) -> None:
+        self._entries[template_dir] = entry
+
+    def save(self) -> None:
+        data = {
+            "version": CACHE_VERSION,
+            "schema_hash": self.schema_hash,
+            "templates": {
+                template_dir: _entry_to_dict(entry)
+                for template_dir, entry in sorted(self._entries.items())
+            },
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=2, default=str)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,163 @@
+import logging
+import subprocess
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Set
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CommitInfo:
+    sha: str
+    time: str
+    """Commit time as ISO 8601 string in UTC"""
+
+
+@dataclass(frozen=True)
+class RepositoryInfo:
+    """Metadata of the repository resolved once per run and shared by all templates."""
+
+    sha: str
+    last_commits: Dict[str, CommitInfo] = field(default_factory=dict)
+    """Last commit by directory (POSIX path relative to the repository root)"""
+
+    def get_last_commit(self, directory: str) -> CommitInfo | None:
+        return self.last_commits.get(Path(directory).as_posix())
+
+
+def _run_git(args: List[str]) -> str:
+    return (
+        subprocess.check_output(["git", *args], stderr=subprocess.PIPE)
+        .decode("utf-8")
+        .strip()
+    )
+
+
+def get_git_sha() -> str:
+    """Get current git SHA."""
+    try:
+        return _run_git(["rev-parse", "HEAD"])
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(
+            f"Failed to get git SHA. Are you in a git repository? Error: {e.stderr.decode('utf-8')}"
+        ) from e
+
+
+def get_current_branch() -> str:
+    try:
+        return _run_git(["rev-parse", "--abbrev-ref", "HEAD"])
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(
+            f"Failed to get current branch. Error: {e.stderr.decode('utf-8')}"
+        ) from e
+
+
+def get_changed_paths(git_ref: str) -> Set[str]:
+    """Get paths changed since `git_ref`, including uncommitted and untracked files."""
+    try:
+        output = "\n".join(
+            [
+                _run_git(
+                    ["-c", "core.quotePath=false", "diff", "--name-only", git_ref, "--"]
+                ),
+                _run_git(
+                    [
+                        "-c",
+                        "core.quotePath=false",
+                        "ls-files",
+                        "--others",
+                        "--exclude-standard",
+                    ]
+                ),
+            ]
+        )
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(
+            f"Failed to get paths changed since {git_ref}. Error: {e.stderr.decode('utf-8')}"
+        ) from e
+    return set(filter(None, output.splitlines()))
+
+
+def get_last_commits(directories: Iterable[str]) -> Dict[str, CommitInfo]:
+    """Get the last commit touching each of `directories` from a single `git log` pass.
+
+    The log is streamed from newest to oldest commit and stops as soon as a commit was
+    found for every directory. Directories without any commit are missing from the result.
+    """
+    remaining = {Path(directory).as_posix() for directory in directories}
+    last_commits: Dict[str, CommitInfo] = {}
+    if not remaining:
+        return last_commits
+
+    if _run_git(["rev-parse", "--is-shallow-repository"]) == "true":
+        logger.warning(
+            "Repository is a shallow clone, last commits of templates may be inaccurate. "
+            "Fetch the full history, e.g., using `git fetch --unshallow`."
+        )
+
+    process = subprocess.Popen(
+        [
+            "git",
+            "-c",
+            "core.quotePath=false",
+            "log",
+            "--format=%x00%H %ct",
+            "--name-only",
+            "--",
+            *sorted(remaining),
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        encoding="utf-8",
+    )
+    assert process.stdout is not None
+    try:
+        commit: CommitInfo | None = None
+        for line in process.stdout:
+            line = line.rstrip("\n")
+            if line.startswith("\0"):
+                sha, timestamp = line[1:].split(" ")
+                commit = CommitInfo(
+                    sha=sha,
+                    time=datetime.fromtimestamp(
+                        int(timestamp), tz=timezone.utc
+                    ).isoformat(),
+                )
+                continue
+            if not line or commit is None:
+                continue
+            parts = line.split("/")
+            for i in range(1, len(parts)):
+                directory = "/".join(parts[:i])
+                if directory in remaining:
+                    remaining.remove(directory)
+                    last_commits[directory] = commit
+                    break
+            if not remaining:
+                break
+        else:
+            if process.wait() != 0:
+                assert process.stderr is not None
+                raise RuntimeError(
+                    f"Failed to get last commits. Error: {process.stderr.read()}"
+                )
+    finally:
+        process.stdout.close()
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+        if process.stderr:
+            process.stderr.close()
+    return last_commits
+
+
+def get_repository_info(
+    template_dirs: Iterable[str], with_last_commits: bool = False
+) -> RepositoryInfo:
+    return RepositoryInfo(
+        sha=get_git_sha(),
+        last_commits=get_last_commits(template_dirs) if with_last_commits else {},
+    )
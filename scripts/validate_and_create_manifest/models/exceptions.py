@@ -1,6 +1,6 @@
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass, field, replace
 from enum import Enum
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
 
 class ValidationErrorType(Enum):
@@ -19,33 +19,168 @@ class ValidationError:
     path: Optional[str] = None
 
 
+class PathErrorCode(Enum):
+    PATH_TOO_LONG = "path_too_long"
+    INVALID_FILE_PATH = "invalid_file_path"
+
+
+@dataclass
+class PathErrors:
+    """Invalid file paths in columnar form, i.e., one list per field with an entry per error.
+
+    Messages are only rendered when formatting the errors so that templates with many
+    invalid paths do not result in an object and a message per error.
+    """
+
+    max_path_length: int
+    segment_pattern: str
+    paths: List[str] = field(default_factory=list)
+    codes: List[PathErrorCode] = field(default_factory=list)
+    segments: List[Optional[str]] = field(default_factory=list)
+    """Invalid segment of the path (`None` if the path as a whole is invalid)"""
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def add(
+        self, path: str, code: PathErrorCode, segment: Optional[str] = None
+    ) -> None:
+        self.paths.append(path)
+        self.codes.append(code)
+        self.segments.append(segment)
+
+    def extend(self, other: "PathErrors") -> None:
+        self.paths.extend(other.paths)
+        self.codes.extend(other.codes)
+        self.segments.extend(other.segments)
+
+    def get_message(self, index: int) -> str:
+        if self.codes[index] == PathErrorCode.PATH_TOO_LONG:
+            return f"Path exceeds {self.max_path_length} characters"
+        return f"Invalid path segment: {self.segments[index]}. Path segment must match {self.segment_pattern}."
+
+    def get_details(self, index: int) -> Dict[str, Any]:
+        details: Dict[str, Any] = {
+            "error": self.codes[index].value,
+            "message": self.get_message(index),
+        }
+        if self.segments[index] is not None:
+            details["segment"] = self.segments[index]
+        return details
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "max_path_length": self.max_path_length,
+            "segment_pattern": self.segment_pattern,
+            "paths": self.paths,
+            "codes": [code.value for code in self.codes],
+            "segments": self.segments,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "PathErrors":
+        return cls(**{**data, "codes": [PathErrorCode(code) for code in data["codes"]]})
+
+
 class ValidationErrors:
     def __init__(self) -> None:
         self.errors: list[ValidationError] = []
+        self.path_errors: Optional[PathErrors] = None
+        # Error types in the order they first occurred, which is the order of the groups
+        # of formatted errors
+        self._error_types: Dict[ValidationErrorType, None] = {}
 
     def add(self, error: ValidationError) -> None:
         self.errors.append(error)
+        self._error_types.setdefault(error.error_type)
 
     def extend(self, errors: list[ValidationError]) -> None:
         for error in errors:
             self.add(error)
 
+    def add_path_errors(self, path_errors: PathErrors) -> None:
+        if not path_errors:
+            return
+        if self.path_errors is None:
+            self.path_errors = replace(path_errors, paths=[], codes=[], segments=[])
+        self.path_errors.extend(path_errors)
+        self._error_types.setdefault(ValidationErrorType.INVALID_FILE_PATH)
+
+    def merge(self, other: "ValidationErrors") -> None:
+        for error_type in other._error_types:
+            if (
+                error_type == ValidationErrorType.INVALID_FILE_PATH
+                and other.path_errors
+            ):
+                self.add_path_errors(other.path_errors)
+            self.extend(
+                [error for error in other.errors if error.error_type == error_type]
+            )
+
     def has_errors(self) -> bool:
-        return len(self.errors) > 0
+        return len(self.errors) > 0 or bool(self.path_errors)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "errors": [
+                {**asdict(error), "error_type": error.error_type.value}
+                for error in self.errors
+            ],
+            "path_errors": self.path_errors.to_dict() if self.path_errors else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ValidationErrors":
+        errors = cls()
+        errors.extend(
+            [
+                ValidationError(
+                    **{**error, "error_type": ValidationErrorType(error["error_type"])}
+                )
+                for error in data.get("errors", [])
+            ]
+        )
+        if path_errors := data.get("path_errors"):
+            errors.add_path_errors(PathErrors.from_dict(path_errors))
+        return errors
+
+    @staticmethod
+    def _format_error(message: str, details: Optional[Dict[str, Any]]) -> str:
+        formatted = f"- {message}"
+        if details:
+            details_str = " ".join(f"{k}={v}" for k, v in details.items())
+            formatted += f" ({details_str})"
+        return formatted
 
     def get_formatted_errors(self) -> str:
-        error_groups: Dict[ValidationErrorType, list[str]] = {}
+        error_groups: Dict[ValidationErrorType, list[str]] = {
+            error_type: [] for error_type in self._error_types
+        }
+        if self.path_errors:
+            error_groups[ValidationErrorType.INVALID_FILE_PATH].extend(
+                self._format_error(
+                    f"Invalid path '{path}': {self.path_errors.get_message(i)}",
+                    self.path_errors.get_details(i),
+                )
+                for i, path in enumerate(self.path_errors.paths)
+            )
         for error in self.errors:
-            message = f"- {error.message}"
-            if error.details:
-                details_str = " ".join(f"{k}={v}" for k, v in error.details.items())
-                message += f" ({details_str})"
-            if error.error_type not in error_groups:
-                error_groups[error.error_type] = []
-            error_groups[error.error_type].append(message)
+            error_groups[error.error_type].append(
+                self._format_error(error.message, error.details)
+            )
 
         formatted = ["Validation failed with the following errors:"]
         for error_type, messages in error_groups.items():
             formatted.append(f"\n{error_type.value.upper()}:")
             formatted.extend(messages)
         return "\n".join(formatted)
+
+
+class ManifestSizeExceededError(Exception):
+    def __init__(self, path: str, size: int, max_size: int) -> None:
+        super().__init__(
+            f"Manifest file size of {path} ({size} bytes so far) exceeds maximum size of {max_size} bytes"
+        )
+        self.path = path
+        self.size = size
+        self.max_size = max_size
@@ -1,4 +1,21 @@
 from dataclasses import dataclass
+from typing import Any, Dict
+
+
+@dataclass
+class FileInfo:
+    path: str
+    """Path relative to the template directory"""
+    size: int
+    sha256: str
+
+
+@dataclass
+class ArchiveInfo:
+    name: str
+    """File name of the archive, containing (a prefix of) its SHA-256 hash"""
+    size: int
+    sha256: str
 
 
 @dataclass
@@ -8,6 +25,21 @@ class TemplateInfo:
     last_modified: str
     name: str
     description: str | None = None
+    last_commit_sha: str | None = None
+    files: list[FileInfo] | None = None
+    archive: ArchiveInfo | None = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TemplateInfo":
+        files = data.get("files")
+        archive = data.get("archive")
+        return cls(
+            **{
+                **data,
+                "files": [FileInfo(**file) for file in files] if files else files,
+                "archive": ArchiveInfo(**archive) if archive else None,
+            }
+        )
 
 
 @dataclass
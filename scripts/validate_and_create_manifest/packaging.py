@@ -0,0 +1,159 @@
+import gzip
+import hashlib
+import os
+import tarfile
+import tempfile
+from dataclasses import dataclass, replace
+from typing import IO, Any, Dict, List, Optional, Tuple
+
+from .models.manifest import ArchiveInfo, FileInfo, TemplateInfo
+from .scan import FileRecord
+
+ARCHIVE_SUFFIX = ".tar.gz"
+# Fixed modification time of archive members (and the gzip header) for reproducible archives
+ARCHIVE_MTIME = 0
+CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class IndexOptions:
+    file_index: bool = False
+    """Whether to add the path, size and SHA-256 hash of each file to the template info"""
+    archive_dir: Optional[str] = None
+    """Directory to write one content-addressed archive per template to"""
+
+    @property
+    def enabled(self) -> bool:
+        return self.file_index or self.archive_dir is not None
+
+
+class _HashingReader:
+    def __init__(self, file: IO[bytes]) -> None:
+        self._file = file
+        self.digest = hashlib.sha256()
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._file.read(size)
+        self.digest.update(data)
+        return data
+
+
+class _HashingWriter:
+    def __init__(self, file: IO[bytes]) -> None:
+        self._file = file
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data: bytes) -> int:
+        self.digest.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    def flush(self) -> None:
+        self._file.flush()
+
+
+def _hash_file(file: IO[bytes]) -> str:
+    digest = hashlib.sha256()
+    while chunk := file.read(CHUNK_SIZE):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _get_tar_info(file: FileRecord, size: int) -> tarfile.TarInfo:
+    tar_info = tarfile.TarInfo(file.relative_path)
+    tar_info.size = size
+    tar_info.mtime = ARCHIVE_MTIME
+    tar_info.mode = 0o755 if file.executable else 0o644
+    tar_info.uid = tar_info.gid = 0
+    tar_info.uname = tar_info.gname = ""
+    return tar_info
+
+
+def index_template(
+    template_id: str, files: List[FileRecord], options: IndexOptions
+) -> Tuple[List[FileInfo], Optional[ArchiveInfo]]:
+    """Hash all files of a template and, optionally, package them into an archive.
+
+    Every file is read once, also if it is added to the archive. The archive is a
+    gzip compressed tarball with the files at its root, in the order of `files`, and
+    with normalized metadata (modification time, owner, permissions) so that the same
+    files always result in the same archive. It is named after the template id and
+    its SHA-256 hash.
+    """
+    file_infos: List[FileInfo] = []
+    archive: Optional[tarfile.TarFile] = None
+    if options.archive_dir is not None:
+        os.makedirs(options.archive_dir, exist_ok=True)
+        tmp_file = tempfile.NamedTemporaryFile(
+            dir=options.archive_dir, suffix=".tmp", delete=False
+        )
+        writer = _HashingWriter(tmp_file)
+        gzip_file = gzip.GzipFile(
+            filename="", mode="wb", fileobj=writer, mtime=ARCHIVE_MTIME  # type: ignore[arg-type]
+        )
+        archive = tarfile.open(fileobj=gzip_file, mode="w", format=tarfile.PAX_FORMAT)
+
+    try:
+        for file in files:
+            with open(file.path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                if archive:
+                    reader = _HashingReader(f)
+                    archive.addfile(_get_tar_info(file, size), reader)  # type: ignore[arg-type]
+                    sha256 = reader.digest.hexdigest()
+                else:
+                    sha256 = _hash_file(f)
+            file_infos.append(
+                FileInfo(path=file.relative_path, size=size, sha256=sha256)
+            )
+    except BaseException:
+        if archive:
+            archive.close()
+            gzip_file.close()
+            tmp_file.close()
+            os.remove(tmp_file.name)
+        raise
+
+    if not archive:
+        return file_infos, None
+
+    archive.close()
+    gzip_file.close()
+    tmp_file.close()
+    os.chmod(tmp_file.name, 0o644)
+    sha256 = writer.digest.hexdigest()
+    name = f"{template_id}-{sha256[:16]}{ARCHIVE_SUFFIX}"
+    os.replace(tmp_file.name, os.path.join(options.archive_dir, name))  # type: ignore[arg-type]
+    return file_infos, ArchiveInfo(name=name, size=writer.size, sha256=sha256)
+
+
+def get_index_fields(
+    template_id: str, files: List[FileRecord], options: IndexOptions
+) -> Dict[str, Any]:
+    """Get the fields of a `TemplateInfo` that are derived from the content of its files."""
+    file_infos, archive = index_template(template_id, files, options)
+    return {
+        "files": file_infos if options.file_index else None,
+        "archive": archive,
+    }
+
+
+def is_index_complete(template_info: TemplateInfo, options: IndexOptions) -> bool:
+    """Check whether `template_info` contains everything requested by `options`."""
+    if options.file_index and template_info.files is None:
+        return False
+    if options.archive_dir is not None:
+        return template_info.archive is not None and os.path.exists(
+            os.path.join(options.archive_dir, template_info.archive.name)
+        )
+    return True
+
+
+def strip_index_fields(template_info: TemplateInfo, options: IndexOptions) -> TemplateInfo:
+    """Remove the fields of a (cached) `template_info` that are not requested by `options`."""
+    return replace(
+        template_info,
+        files=template_info.files if options.file_index else None,
+        archive=template_info.archive if options.archive_dir is not None else None,
+    )
@@ -0,0 +1,93 @@
+import os
+from dataclasses import dataclass
+from typing import Iterator, Optional, Tuple
+
+from pathspec import PathSpec
+from pathspec.patterns import GitWildMatchPattern
+
+NESTED_IGNORE_FILE_NAME = ".gitignore"
+
+# Ignore specs paired with the path prefix (directory incl. trailing separator)
+# their patterns are relative to. Ordered from outermost to innermost.
+IgnoreSpecs = Tuple[Tuple[str, PathSpec], ...]
+
+
+@dataclass(frozen=True)
+class FileRecord:
+    path: str
+    """Path of the file relative to the repository root, e.g., `src/my-agent/main.py`."""
+    relative_path: str
+    """Path of the file relative to the template directory, e.g., `main.py`."""
+    size: int
+    mtime: float
+    executable: bool = False
+
+
+def scan_template_directory(
+    template_dir: str, ignore_path_spec: PathSpec
+) -> Iterator[FileRecord]:
+    """Walk a template directory once and yield a record for every file that is not ignored.
+
+    Uses `os.scandir` so that file type information comes from the directory listing and
+    only a single `stat` call is made per file. Ignored directories are pruned instead of
+    being walked. Besides `ignore_path_spec`, which is matched against paths relative to
+    the repository root, `.gitignore` files found inside the template directory are
+    applied to the directory they are located in, with inner files taking precedence
+    like in git. Entries are yielded in sorted order to make the output independent of
+    the file system.
+    """
+    yield from _scan(os.path.relpath(template_dir), "", (("", ignore_path_spec),))
+
+
+def _load_nested_ignore_spec(directory: str) -> Optional[PathSpec]:
+    ignore_file_path = os.path.join(directory, NESTED_IGNORE_FILE_NAME)
+    try:
+        with open(ignore_file_path, "r") as f:
+            return PathSpec.from_lines(GitWildMatchPattern, f)
+    except (FileNotFoundError, NotADirectoryError, IsADirectoryError):
+        return None
+
+
+def _is_ignored(path: str, ignore_specs: IgnoreSpecs) -> bool:
+    ignored = False
+    for prefix, spec in ignore_specs:
+        include = spec.check_file(path[len(prefix) :]).include
+        if include is not None:
+            ignored = include
+    return ignored
+
+
+def _scan(
+    directory: str, relative_directory: str, ignore_specs: IgnoreSpecs
+) -> Iterator[FileRecord]:
+    with os.scandir(directory) as it:
+        entries = sorted(it, key=lambda entry: entry.name)
+
+    if any(entry.name == NESTED_IGNORE_FILE_NAME for entry in entries):
+        if nested_spec := _load_nested_ignore_spec(directory):
+            ignore_specs = ignore_specs + ((directory + os.sep, nested_spec),)
+
+    subdirectories = []
+    for entry in entries:
+        relative_path = (
+            f"{relative_directory}/{entry.name}" if relative_directory else entry.name
+        )
+        if entry.is_dir():
+            if not entry.is_symlink() and not _is_ignored(
+                entry.path + "/", ignore_specs
+            ):
+                subdirectories.append((entry.path, relative_path))
+            continue
+        if _is_ignored(entry.path, ignore_specs):
+            continue
+        stat = entry.stat()
+        yield FileRecord(
+            path=entry.path,
+            relative_path=relative_path,
+            size=stat.st_size,
+            mtime=stat.st_mtime,
+            executable=bool(stat.st_mode & 0o111),
+        )
+
+    for subdirectory, relative_subdirectory in subdirectories:
+        yield from _scan(subdirectory, relative_subdirectory, ignore_specs)
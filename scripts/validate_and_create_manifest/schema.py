@@ -0,0 +1,64 @@
+import hashlib
+import json
+from typing import Any, Dict, IO, List, Union
+
+import jsonschema
+import yaml
+from jsonschema import Draft202012Validator
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:  # PyYAML built without libyaml
+    from yaml import SafeLoader  # type: ignore[assignment]
+
+# Compiled validators by schema hash so that each (worker) process compiles a schema once
+_validators: Dict[str, Draft202012Validator] = {}
+
+
+def load_yaml(stream: Union[str, bytes, IO[str], IO[bytes]]) -> Any:
+    """Like `yaml.safe_load` but uses the C implementation of PyYAML if available."""
+    return yaml.load(stream, Loader=SafeLoader)
+
+
+def get_schema_hash(schema: Dict[str, Any]) -> str:
+    return hashlib.sha256(
+        json.dumps(schema, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+
+class AgentSchema:
+    """Agent schema compiled into a reusable Draft 2020-12 validator.
+
+    The schema itself is checked against the metaschema only once, on construction.
+    Instances can be passed to worker processes; the validator is compiled at most once
+    per process.
+    """
+
+    def __init__(self, schema: Dict[str, Any]) -> None:
+        Draft202012Validator.check_schema(schema)
+        self.schema = schema
+        self.hash = get_schema_hash(schema)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {"schema": self.schema, "hash": self.hash}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.schema = state["schema"]
+        self.hash = state["hash"]
+
+    @property
+    def validator(self) -> Draft202012Validator:
+        if self.hash not in _validators:
+            _validators[self.hash] = Draft202012Validator(self.schema)
+        return _validators[self.hash]
+
+    def get_errors(self, instance: Any) -> List[jsonschema.ValidationError]:
+        """Get all schema violations of `instance` ordered by their JSON path."""
+        return sorted(
+            self.validator.iter_errors(instance), key=lambda error: error.json_path
+        )
+
+
+def load_agent_schema(path: str) -> AgentSchema:
+    with open(path, "r") as f:
+        return AgentSchema(load_yaml(f))
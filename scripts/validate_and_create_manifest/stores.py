@@ -0,0 +1,157 @@
+import hashlib
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class RemoteObject:
+    key: str
+    md5: Optional[str]
+    """MD5 hash of the content (hex) if known, e.g., `None` for multipart uploads to S3"""
+    version_id: Optional[str] = None
+
+
+def get_bytes_md5(data: bytes) -> str:
+    return hashlib.md5(data, usedforsecurity=False).hexdigest()
+
+
+def get_md5(path: str) -> str:
+    """Get the MD5 hash of a file, which is what S3 reports as ETag of single-part uploads."""
+    digest = hashlib.md5(usedforsecurity=False)
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ObjectStore(ABC):
+    """Versioned object store templates are synced to.
+
+    Implementations must be safe to use from multiple threads.
+    """
+
+    @abstractmethod
+    def list_objects(self, prefix: str) -> Dict[str, RemoteObject]:
+        """List the latest version of all objects whose key starts with `prefix` by key."""
+
+    @abstractmethod
+    def upload_file(self, key: str, path: str) -> RemoteObject:
+        """Upload the file at `path` as new version of the object with `key`."""
+
+    @abstractmethod
+    def put_object(self, key: str, body: bytes) -> RemoteObject:
+        """Upload `body` as new version of the object with `key`."""
+
+    @abstractmethod
+    def delete_object(self, key: str) -> None:
+        """Delete the object with `key`."""
+
+
+class LocalDirectoryStore(ObjectStore):
+    """Object store backed by a local directory, e.g., for testing or benchmarking syncs offline.
+
+    Objects are stored as files at their key relative to `root`. As there is no real
+    versioning, the version id of an object is the MD5 hash of its content.
+    """
+
+    def __init__(self, root: str) -> None:
+        self.root = root
+
+    def _get_path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    def list_objects(self, prefix: str) -> Dict[str, RemoteObject]:
+        objects: Dict[str, RemoteObject] = {}
+        # Only walk the deepest directory containing all keys starting with the prefix
+        directory = self._get_path(prefix.rpartition("/")[0])
+        for root, _, files in os.walk(directory):
+            for file in files:
+                path = os.path.join(root, file)
+                key = os.path.relpath(path, self.root).replace(os.sep, "/")
+                if not key.startswith(prefix):
+                    continue
+                md5 = get_md5(path)
+                objects[key] = RemoteObject(key=key, md5=md5, version_id=md5)
+        return objects
+
+    def _write(self, key: str, body: bytes) -> RemoteObject:
+        path = self._get_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            dir=os.path.dirname(path), suffix=".tmp", delete=False
+        ) as f:
+            f.write(body)
+        os.replace(f.name, path)
+        md5 = get_bytes_md5(body)
+        return RemoteObject(key=key, md5=md5, version_id=md5)
+
+    def upload_file(self, key: str, path: str) -> RemoteObject:
+        with open(path, "rb") as f:
+            return self._write(key, f.read())
+
+    def put_object(self, key: str, body: bytes) -> RemoteObject:
+        return self._write(key, body)
+
+    def delete_object(self, key: str) -> None:
+        path = self._get_path(key)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+class S3Store(ObjectStore):
+    """Object store backed by a (versioned) S3 bucket. Requires `boto3`."""
+
+    def __init__(self, bucket: str, client: Any = None) -> None:
+        if client is None:
+            try:
+                import boto3
+            except ImportError as e:
+                raise RuntimeError(
+                    "Syncing to S3 requires boto3. Install it using `pip install -r scripts/requirements.txt`."
+                ) from e
+            client = boto3.client("s3")
+        self.bucket = bucket
+        self._client = client
+
+    @staticmethod
+    def _get_md5(etag: str) -> Optional[str]:
+        etag = etag.strip('"')
+        # ETags of multipart uploads are not the MD5 hash of the content
+        return None if "-" in etag else etag
+
+    def list_objects(self, prefix: str) -> Dict[str, RemoteObject]:
+        objects: Dict[str, RemoteObject] = {}
+        paginator = self._client.get_paginator("list_object_versions")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            for version in page.get("Versions", []):
+                if not version["IsLatest"]:
+                    continue
+                objects[version["Key"]] = RemoteObject(
+                    key=version["Key"],
+                    md5=self._get_md5(version["ETag"]),
+                    version_id=version["VersionId"],
+                )
+        return objects
+
+    def _put(self, key: str, body: Any) -> RemoteObject:
+        response = self._client.put_object(Bucket=self.bucket, Key=key, Body=body)
+        return RemoteObject(
+            key=key,
+            md5=self._get_md5(response["ETag"]),
+            version_id=response.get("VersionId"),
+        )
+
+    def upload_file(self, key: str, path: str) -> RemoteObject:
+        with open(path, "rb") as f:
+            return self._put(key, f)
+
+    def put_object(self, key: str, body: bytes) -> RemoteObject:
+        return self._put(key, body)
+
+    def delete_object(self, key: str) -> None:
+        self._client.delete_object(Bucket=self.bucket, Key=key)
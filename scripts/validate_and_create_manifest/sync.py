@@ -0,0 +1,197 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+import yaml
+from pathspec import PathSpec
+
+from .scan import scan_template_directory
+from .schema import load_yaml
+from .stores import ObjectStore, RemoteObject, get_bytes_md5, get_md5
+
+S3_BUCKET = "askui-no-code"
+S3_DEV_BUCKET = "askui-no-code-dev"
+S3_BUCKET_BRANCH = "main"  # branch synced to S3_BUCKET, all others to S3_DEV_BUCKET
+S3_TEMPLATES_PREFIX = "agents/templates"
+S3_TEMPLATES_SRC_PREFIX = f"{S3_TEMPLATES_PREFIX}/src"
+S3_TEMPLATES_ARCHIVES_PREFIX = f"{S3_TEMPLATES_PREFIX}/archives"
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SyncResult:
+    uploaded: List[str] = field(default_factory=list)
+    deleted: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+
+
+def get_version_manifest(objects: Iterable[RemoteObject]) -> bytes:
+    """Render the `<id>.manifest.yml` listing the latest version of every object of a template."""
+    return yaml.dump(
+        {
+            "objects": [
+                {"key": obj.key, "version_id": obj.version_id}
+                for obj in sorted(objects, key=lambda obj: obj.key)
+            ]
+        },
+        sort_keys=False,
+    ).encode("utf-8")
+
+
+class TemplateSync:
+    """Syncs templates, their version manifests and the manifest to an `ObjectStore`.
+
+    The remote state is listed once. Only files whose MD5 hash differs from the remote
+    object are uploaded and remote template files that do not exist locally anymore are
+    deleted, using a pool of at most `jobs` threads. Afterwards, the version manifest of
+    each template is derived from the listing and the upload results and, finally, the
+    manifest files are uploaded so that clients never see a manifest referencing
+    templates that are not fully uploaded yet.
+    """
+
+    def __init__(
+        self,
+        store: ObjectStore,
+        ignore_path_spec: PathSpec,
+        templates_dir: str = "src",
+        jobs: int = 8,
+        dry_run: bool = False,
+    ) -> None:
+        self.store = store
+        self.ignore_path_spec = ignore_path_spec
+        self.templates_dir = templates_dir
+        self.jobs = jobs
+        self.dry_run = dry_run
+
+    def _get_local_files(self, template_ids: Iterable[str]) -> Dict[str, str]:
+        """Get the paths of all files to sync by object key."""
+        files: Dict[str, str] = {}
+        for template_id in template_ids:
+            template_dir = os.path.join(self.templates_dir, template_id)
+            for file in scan_template_directory(template_dir, self.ignore_path_spec):
+                key = f"{S3_TEMPLATES_SRC_PREFIX}/{template_id}/{file.relative_path}"
+                files[key] = file.path
+        return files
+
+    def _put_if_changed(
+        self,
+        key: str,
+        body: bytes,
+        remote: Dict[str, RemoteObject],
+        result: SyncResult,
+    ) -> None:
+        remote_object = remote.get(key)
+        if remote_object and remote_object.md5 == get_bytes_md5(body):
+            result.unchanged.append(key)
+            return
+        logger.info(f"Uploading {key}")
+        if not self.dry_run:
+            self.store.put_object(key, body)
+        result.uploaded.append(key)
+
+    def sync(
+        self,
+        template_ids: List[str],
+        manifest_paths: List[str],
+        archive_paths: Optional[Dict[str, str]] = None,
+    ) -> SyncResult:
+        """Sync templates.
+
+        `manifest_paths` are uploaded to the root of the templates prefix after everything
+        else. `archive_paths` are archive files by name, uploaded unless they exist already.
+        """
+        result = SyncResult()
+        remote = self.store.list_objects(f"{S3_TEMPLATES_PREFIX}/")
+        local_files = self._get_local_files(template_ids)
+
+        # Unlike with background jobs of a shell, exceptions raised by any task are
+        # re-raised when consuming the results of `executor.map()`
+        with ThreadPoolExecutor(max_workers=max(1, self.jobs)) as executor:
+            local_md5s = dict(
+                zip(local_files, list(executor.map(get_md5, local_files.values())))
+            )
+            to_upload = [
+                key
+                for key, md5 in local_md5s.items()
+                if key not in remote or remote[key].md5 != md5
+            ]
+            to_upload_set = set(to_upload)
+            to_delete = sorted(
+                key
+                for key in remote
+                if key.startswith(f"{S3_TEMPLATES_SRC_PREFIX}/")
+                and key not in local_files
+            )
+            result.unchanged.extend(
+                key for key in local_files if key not in to_upload_set
+            )
+
+            def upload(key: str) -> RemoteObject:
+                logger.info(f"Uploading {key}")
+                if self.dry_run:
+                    return RemoteObject(key=key, md5=local_md5s[key])
+                return self.store.upload_file(key, local_files[key])
+
+            def delete(key: str) -> None:
+                logger.info(f"Deleting {key}")
+                if not self.dry_run:
+                    self.store.delete_object(key)
+
+            uploaded = list(executor.map(upload, to_upload))
+            list(executor.map(delete, to_delete))
+            result.uploaded.extend(to_upload)
+            result.deleted.extend(to_delete)
+
+            # Latest version of every template file after the sync
+            latest = {key: remote[key] for key in local_files if key in remote}
+            latest.update((obj.key, obj) for obj in uploaded)
+
+            def sync_version_manifest(template_id: str) -> None:
+                prefix = f"{S3_TEMPLATES_SRC_PREFIX}/{template_id}/"
+                self._put_if_changed(
+                    f"{S3_TEMPLATES_PREFIX}/{template_id}.manifest.yml",
+                    get_version_manifest(
+                        obj for key, obj in latest.items() if key.startswith(prefix)
+                    ),
+                    remote,
+                    result,
+                )
+
+            list(executor.map(sync_version_manifest, template_ids))
+
+            def upload_archive(item: tuple[str, str]) -> None:
+                name, path = item
+                key = f"{S3_TEMPLATES_ARCHIVES_PREFIX}/{name}"
+                # Archives are content-addressed, i.e., an existing one never changes
+                if key in remote:
+                    result.unchanged.append(key)
+                    return
+                logger.info(f"Uploading {key}")
+                if not self.dry_run:
+                    self.store.upload_file(key, path)
+                result.uploaded.append(key)
+
+            list(executor.map(upload_archive, sorted((archive_paths or {}).items())))
+
+        for manifest_path in manifest_paths:
+            with open(manifest_path, "rb") as f:
+                self._put_if_changed(
+                    f"{S3_TEMPLATES_PREFIX}/{os.path.basename(manifest_path)}",
+                    f.read(),
+                    remote,
+                    result,
+                )
+
+        result.uploaded.sort()
+        result.deleted.sort()
+        result.unchanged.sort()
+        return result
+
+
+def load_manifest_templates(manifest_path: str) -> List[Dict[str, Any]]:
+    with open(manifest_path, "r") as f:
+        manifest = load_yaml(f)
+    return manifest.get("agent_templates") or []
@@ -0,0 +1,117 @@
+import gzip
+import json
+import os
+from dataclasses import asdict
+from types import TracebackType
+from typing import IO, List, Optional, Type
+
+import yaml
+
+from .models.exceptions import ManifestSizeExceededError
+from .models.manifest import TemplateInfo
+
+try:
+    from yaml import CSafeDumper as SafeDumper
+except ImportError:  # PyYAML built without libyaml
+    from yaml import SafeDumper  # type: ignore[assignment]
+
+
+class _ManifestFile:
+    """Temporary output file of a manifest, optionally with a gzip variant next to it."""
+
+    def __init__(self, path: str, gzip_compressed: bool) -> None:
+        self.path = path
+        self.size = 0
+        self._targets: List[tuple[str, str]] = [(f"{path}.tmp", path)]
+        self._file: IO[bytes] = open(f"{path}.tmp", "wb")
+        self._gzip_file: Optional[IO[bytes]] = None
+        if gzip_compressed:
+            self._targets.append((f"{path}.gz.tmp", f"{path}.gz"))
+            # mtime=0 and no file name in the header keep the archive reproducible
+            self._gzip_file = gzip.GzipFile(
+                filename="", mode="wb", fileobj=open(f"{path}.gz.tmp", "wb"), mtime=0
+            )
+
+    def write(self, data: str) -> None:
+        encoded = data.encode("utf-8")
+        self.size += len(encoded)
+        self._file.write(encoded)
+        if self._gzip_file:
+            self._gzip_file.write(encoded)
+
+    def close(self, commit: bool) -> None:
+        self._file.close()
+        if self._gzip_file:
+            fileobj = self._gzip_file.fileobj  # type: ignore[attr-defined]
+            self._gzip_file.close()
+            fileobj.close()
+        for tmp_path, path in self._targets:
+            if commit:
+                os.replace(tmp_path, path)
+            elif os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+class ManifestWriter:
+    """Streams the `TemplateInfo` entries of a manifest to disk.
+
+    Writes `manifest.yml` and, optionally, a compact JSON variant as well as gzip
+    compressed variants of both. A running byte count of each (uncompressed) file is
+    checked against `max_size` after every entry so that writing fails as soon as the
+    limit is crossed instead of serializing the whole manifest up front. Files are only
+    moved into place if the writer is closed without an error; otherwise, existing
+    manifest files are left untouched.
+    """
+
+    def __init__(
+        self,
+        yml_path: str,
+        json_path: Optional[str] = None,
+        gzip_compressed: bool = False,
+        max_size: Optional[int] = None,
+    ) -> None:
+        self.max_size = max_size
+        self.count = 0
+        self._yml = _ManifestFile(yml_path, gzip_compressed)
+        self._json = _ManifestFile(json_path, gzip_compressed) if json_path else None
+        if self._json:
+            self._json.write('{"agent_templates":[')
+
+    def __enter__(self) -> "ManifestWriter":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close(commit=exc_type is None)
+
+    def _check_size(self, file: _ManifestFile) -> None:
+        if self.max_size is not None and file.size > self.max_size:
+            raise ManifestSizeExceededError(file.path, file.size, self.max_size)
+
+    def write(self, template_info: TemplateInfo) -> None:
+        # Optional fields that are not set are omitted to keep the manifest compact
+        data = {k: v for k, v in asdict(template_info).items() if v is not None}
+        if self.count == 0:
+            self._yml.write("agent_templates:\n")
+        self._yml.write(yaml.dump([data], Dumper=SafeDumper))
+        self._check_size(self._yml)
+        if self._json:
+            self._json.write(
+                ("," if self.count else "") + json.dumps(data, separators=(",", ":"))
+            )
+            self._check_size(self._json)
+        self.count += 1
+
+    def close(self, commit: bool = True) -> None:
+        if commit:
+            if self.count == 0:
+                self._yml.write("agent_templates: []\n")
+            if self._json:
+                self._json.write("]}")
+        self._yml.close(commit)
+        if self._json:
+            self._json.close(commit)
@@ -0,0 +1,359 @@
+import argparse
+import copy
+import hashlib
+import json
+import os
+import re
+import shutil
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import openpyxl
+from fastmcp.mcp_config import MCPConfig
+
+from askui import VisionAgent
+from askui.custom_agent import CustomAgent
+from askui.models.shared.tools import ToolCollection
+from askui.tools.mcp.config import StdioMCPServer
+
+from helpers.mcp_pool import McpSessionPool
+from helpers.tools import (
+    AskUIExtractRowsToExcelTool,
+    AskUIGetFromFileTool,
+    AskUIGetManyFromFileTool,
+    WriteTableToExcelTool,
+)
+
+DOCUMENT_PROMPT = """
+Read "{document}".
+The Excel file "{output_file}" is a copy of the template. Fill it with the data from the PDF following the template.
+Do not create other files.
+"""
+# Characters that are not allowed in sheet names, which are at most 31 characters long
+INVALID_SHEET_NAME_REGEX = re.compile(r"[\[\]:*?/\\]")
+MAX_SHEET_NAME_LENGTH = 31
+
+
+def load_documents(source):
+    """
+    Get the absolute paths of the PDF files of a batch, either all PDF files below the
+    directory `source` or the files listed in the manifest `source`, i.e., a text file
+    with one path per line or a JSON file with a list of paths, relative to the manifest.
+    """
+    source = Path(source).resolve()
+    if source.is_dir():
+        return sorted(str(path) for path in source.rglob("*.pdf"))
+    with open(source, "r", encoding="utf-8") as f:
+        if source.suffix == ".json":
+            paths = json.load(f)
+        else:
+            paths = [
+                line.strip()
+                for line in f
+                if line.strip() and not line.startswith("#")
+            ]
+    return [str((source.parent / path).resolve()) for path in paths]
+
+
+def get_output_names(documents):
+    """Get unique names of the outputs of documents from their paths relative to the common directory."""
+    if not documents:
+        return {}
+    root = os.path.commonpath([os.path.dirname(document) for document in documents])
+    return {
+        document: os.path.splitext(os.path.relpath(document, root))[0].replace(
+            os.sep, "__"
+        )
+        for document in documents
+    }
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Journal:
+    """
+    Progress of a batch as JSON lines, one per processed document.
+
+    Documents recorded as done (with an unchanged content) are skipped when the batch is
+    run again, e.g., after it was interrupted.
+    """
+
+    def __init__(self, path):
+        self._path = path
+        self._lock = threading.Lock()
+        self._entries = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # Last line of a batch that was killed while writing
+                    self._entries[entry["document"]] = entry
+
+    def is_done(self, document, sha256):
+        entry = self._entries.get(document)
+        return entry is not None and entry["status"] == "done" and entry["sha256"] == sha256
+
+    def record(self, entry):
+        with self._lock:
+            self._entries[entry["document"]] = entry
+            with open(self._path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+class DocumentProcessor:
+    """
+    Processes documents with an agent each, sharing the tools, their caches and a pool of
+    `workers` warm sessions of the Excel MCP server across all documents of a batch.
+    """
+
+    def __init__(self, work_dir, workers, cache_dir=None):
+        self._mcp_pool = McpSessionPool(
+            MCPConfig(
+                mcpServers={
+                    "excel_mcp_server": StdioMCPServer(
+                        command="excel-mcp-server",
+                        args=["stdio", "--excel-files-path", work_dir],
+                    )
+                }
+            ),
+            size=workers,
+        )
+        # Paths of documents are absolute, i.e., independent of the directory of the tool.
+        # Its agent only extracts data from files using the model, so it is never opened,
+        # i.e., no desktop controller is started.
+        self._get_from_file_tool = AskUIGetFromFileTool(
+            work_dir, agent=VisionAgent(), cache_dir=cache_dir, max_workers=2
+        )
+        self._tools = [
+            self._get_from_file_tool,
+            AskUIGetManyFromFileTool(self._get_from_file_tool),
+            AskUIExtractRowsToExcelTool(self._get_from_file_tool, work_dir),
+            WriteTableToExcelTool(work_dir),
+        ]
+        self._agents = threading.local()
+
+    def __call__(self, document, output_file):
+        # Agents are not shared across threads, their tools are
+        if not hasattr(self._agents, "agent"):
+            self._agents.agent = CustomAgent()
+        tools = ToolCollection(tools=self._tools, mcp_client=self._mcp_pool)
+        self._agents.agent.act(
+            [
+                {
+                    "role": "user",
+                    "content": DOCUMENT_PROMPT.format(
+                        document=document, output_file=output_file
+                    ),
+                }
+            ],
+            tools=tools,
+        )
+
+    def close(self):
+        self._get_from_file_tool.close()
+        self._mcp_pool.close()
+
+
+def process_document(process, document, template, output_path, retries):
+    """Copy the template to `output_path` and let `process` fill it, retrying on failure."""
+    template_hash = file_hash(template)
+    attempts = 0
+    while True:
+        attempts += 1
+        start = time.perf_counter()
+        try:
+            shutil.copyfile(template, output_path)
+            process(document, os.path.basename(output_path))
+            # The agent may finish without error, e.g., if a tool is not available
+            if file_hash(output_path) == template_hash:
+                raise RuntimeError("The output was not filled")
+            return attempts, time.perf_counter() - start, None
+        except Exception as e:
+            if attempts > retries:
+                if os.path.exists(output_path):
+                    os.remove(output_path)
+                return attempts, time.perf_counter() - start, f"{type(e).__name__}: {e}"
+            time.sleep(2 ** (attempts - 1))  # Back off, e.g., from rate limits
+
+
+def get_sheet_name(name, used_names):
+    name = INVALID_SHEET_NAME_REGEX.sub("_", name)[:MAX_SHEET_NAME_LENGTH]
+    candidate, i = name, 1
+    while candidate.casefold() in used_names:
+        i += 1
+        suffix = f"~{i}"
+        candidate = name[: MAX_SHEET_NAME_LENGTH - len(suffix)] + suffix
+    used_names.add(candidate.casefold())
+    return candidate
+
+
+def copy_sheet(source, target):
+    """Copy the values, styles, merged cells and dimensions of a sheet into a sheet of another workbook."""
+    for row in source.iter_rows():
+        for cell in row:
+            target_cell = target.cell(row=cell.row, column=cell.column, value=cell.value)
+            if cell.has_style:
+                target_cell.font = copy.copy(cell.font)
+                target_cell.fill = copy.copy(cell.fill)
+                target_cell.border = copy.copy(cell.border)
+                target_cell.alignment = copy.copy(cell.alignment)
+                target_cell.protection = copy.copy(cell.protection)
+                target_cell.number_format = cell.number_format
+    for merged_range in source.merged_cells.ranges:
+        target.merge_cells(str(merged_range))
+    for key, dimension in source.column_dimensions.items():
+        target.column_dimensions[key].width = dimension.width
+    for key, dimension in source.row_dimensions.items():
+        target.row_dimensions[key].height = dimension.height
+
+
+def combine_outputs(outputs, combined_path):
+    """Combine the first sheet of each output into one workbook, one sheet per output, in order."""
+    combined = openpyxl.Workbook()
+    combined.remove(combined.active)
+    used_names = set()
+    for name, output_path in outputs:
+        source = openpyxl.load_workbook(output_path)
+        target = combined.create_sheet(get_sheet_name(name, used_names))
+        copy_sheet(source.worksheets[0], target)
+    combined.save(combined_path)
+
+
+def run_batch(
+    documents,
+    template,
+    output_dir,
+    process,
+    journal,
+    workers=4,
+    retries=2,
+    combined_path=None,
+):
+    """
+    Process `documents` with `process(document, output_file)`, at most `workers` at a time.
+
+    Each document gets its own copy of `template` in `output_dir`, named after its path. If
+    `combined_path` is given, the outputs are combined into one workbook with one sheet per
+    document afterwards. Returns the summary of the batch.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    output_names = get_output_names(documents)
+    hashes = {document: file_hash(document) for document in documents}
+    pending = [
+        document
+        for document in documents
+        if not journal.is_done(output_names[document], hashes[document])
+    ]
+    print(
+        f"Processing {len(pending)} of {len(documents)} documents "
+        f"({len(documents) - len(pending)} already done) with {workers} workers"
+    )
+
+    start = time.perf_counter()
+    durations = []
+    failed = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(
+                process_document,
+                process,
+                document,
+                template,
+                os.path.join(output_dir, output_names[document] + ".xlsx"),
+                retries,
+            ): document
+            for document in pending
+        }
+        for i, future in enumerate(as_completed(futures), 1):
+            document = futures[future]
+            attempts, seconds, error = future.result()
+            journal.record(
+                {
+                    "document": output_names[document],
+                    "path": document,
+                    "sha256": hashes[document],
+                    "status": "failed" if error else "done",
+                    "attempts": attempts,
+                    "seconds": round(seconds, 3),
+                    "error": error,
+                }
+            )
+            durations.append(seconds)
+            if error:
+                failed.append(document)
+            status = f"failed: {error}" if error else "done"
+            print(f"[{i}/{len(pending)}] {document} {status} in {seconds:.1f}s ({attempts} attempts)")
+
+    if combined_path:
+        combine_outputs(
+            [
+                (output_names[document], os.path.join(output_dir, output_names[document] + ".xlsx"))
+                for document in documents
+                if document not in failed
+            ],
+            combined_path,
+        )
+    return {
+        "documents": len(documents),
+        "skipped": len(documents) - len(pending),
+        "done": len(pending) - len(failed),
+        "failed": failed,
+        "seconds": round(time.perf_counter() - start, 3),
+        "seconds_per_document": {
+            "mean": round(statistics.fmean(durations), 3),
+            "max": round(max(durations), 3),
+        }
+        if durations
+        else None,
+    }
+
+
+def main():
+    base_dir = Path(__file__).parent.resolve()
+    parser = argparse.ArgumentParser(
+        description="Fill a copy of an Excel template with the data of each PDF of a batch"
+    )
+    parser.add_argument("source", help="Directory with the PDF files or manifest listing them (.txt with one path per line or .json)")
+    parser.add_argument("--template", default=str(base_dir / "source_files" / "demo_template.xlsx"), help="Excel template (default: source_files/demo_template.xlsx)")
+    parser.add_argument("--output-dir", default=str(base_dir / "output"), help="Directory to write an Excel file per document to (default: output)")
+    parser.add_argument("--combined", help="Also combine the outputs into this Excel file, one sheet per document")
+    parser.add_argument("--workers", type=int, default=4, help="Number of documents processed at a time (default: 4)")
+    parser.add_argument("--retries", type=int, default=2, help="Number of retries of failed documents (default: 2)")
+    parser.add_argument("--journal", help="Progress journal, documents done according to it are skipped (default: OUTPUT_DIR/batch-journal.jsonl)")
+    args = parser.parse_args()
+
+    output_dir = os.path.abspath(args.output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    journal = Journal(args.journal or os.path.join(output_dir, "batch-journal.jsonl"))
+    process = DocumentProcessor(
+        output_dir, args.workers, cache_dir=str(base_dir / ".cache" / "extractions")
+    )
+    try:
+        summary = run_batch(
+            load_documents(args.source),
+            args.template,
+            output_dir,
+            process,
+            journal,
+            workers=args.workers,
+            retries=args.retries,
+            combined_path=args.combined,
+        )
+    finally:
+        process.close()
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
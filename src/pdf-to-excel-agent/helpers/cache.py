@@ -0,0 +1,97 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+def normalize_query(query):
+    """Normalize a query so that differences in case and whitespace do not miss the cache."""
+    return " ".join(query.split()).casefold()
+
+
+class ExtractionCache:
+    """
+    A thread-safe cache of answers to queries about files.
+
+    Answers are keyed by the SHA-256 of the file content and the normalized query, so that
+    they are reused across file names and invalidated as soon as the file changes. The
+    cache keeps the `max_entries` most recently used answers in memory and, if `cache_dir`
+    is given, additionally stores every answer as JSON file in `cache_dir` so that it
+    survives restarts.
+    """
+
+    def __init__(self, max_entries=256, cache_dir=None):
+        self._max_entries = max_entries
+        self._cache_dir = cache_dir
+        self._entries = OrderedDict()
+        # File hashes by path, reused as long as size and modification time are unchanged
+        self._file_hashes = {}
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def file_hash(self, path):
+        stat = os.stat(path)
+        with self._lock:
+            cached = self._file_hashes.get(path)
+        if cached and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+            return cached[2]
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        file_hash = digest.hexdigest()
+        with self._lock:
+            self._file_hashes[path] = (stat.st_size, stat.st_mtime_ns, file_hash)
+        return file_hash
+
+    def key(self, file_path, query):
+        return f"{self.file_hash(file_path)}:{normalize_query(query)}"
+
+    def get(self, key):
+        """Get the cached answer for `key` or `None`."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        answer = self._read(key)
+        if answer is not None:
+            self._remember(key, answer)
+        return answer
+
+    def put(self, key, answer):
+        self._remember(key, answer)
+        self._write(key, answer)
+
+    def _remember(self, key, answer):
+        with self._lock:
+            self._entries[key] = answer
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def _entry_path(self, key):
+        name = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self._cache_dir, f"{name}.json")
+
+    def _read(self, key):
+        if not self._cache_dir:
+            return None
+        try:
+            with open(self._entry_path(key), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # Guard against (very unlikely) collisions of the file names
+        return entry["answer"] if entry.get("key") == key else None
+
+    def _write(self, key, answer):
+        if not self._cache_dir:
+            return
+        # Write to a temporary file first so that readers never see partial entries
+        fd, tmp_path = tempfile.mkstemp(dir=self._cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"key": key, "answer": answer}, f)
+        os.replace(tmp_path, self._entry_path(key))
@@ -0,0 +1,189 @@
+import base64
+import io
+import json
+import re
+from dataclasses import dataclass, field
+
+import docx
+import pdfplumber
+import pypdfium2
+
+# File types whose text can be extracted locally (.doc is only supported by the model)
+LOCAL_FILE_EXTENSIONS = (".pdf", ".docx")
+# Pages with less text are considered to be scanned, i.e., to have no text layer
+MIN_TEXT_LENGTH = 20
+# Resolution scanned pages are rendered at for the model (2 = 144 DPI)
+RENDER_SCALE = 2
+STRUCTURED_QUERY_REGEX = re.compile(
+    r"^(text|tables)(?: (?:of|on|from) pages? ([\d]+(?: ?- ?[\d]+)?(?: ?, ?[\d]+(?: ?- ?[\d]+)?)*))?$"
+)
+
+
+@dataclass
+class Page:
+    """Text and tables (lists of rows of cells) of a page, numbered from 1."""
+
+    number: int
+    text: str
+    tables: list = field(default_factory=list)
+
+    @property
+    def scanned(self):
+        return len(self.text.strip()) < MIN_TEXT_LENGTH and not self.tables
+
+
+def parse_page_numbers(value):
+    """
+    Parse page numbers like "1-3, 5" into a sorted list of numbers.
+
+    Raises a `ValueError` for page 0 and reversed ranges like "5-3".
+    """
+    numbers = set()
+    for part in value.split(","):
+        start, _, end = part.partition("-")
+        start, end = int(start), int(end or start)
+        if start < 1:
+            raise ValueError(f'Invalid pages "{part.strip()}": pages are numbered from 1.')
+        if end < start:
+            raise ValueError(f'Invalid pages "{part.strip()}": the range is reversed.')
+        numbers.update(range(start, end + 1))
+    return sorted(numbers)
+
+
+def parse_structured_query(query):
+    """
+    Parse a query that can be answered from the text layer of a file, i.e., "text" or
+    "tables", optionally followed by "of pages 1-3, 5" (see `STRUCTURED_QUERY_REGEX`).
+
+    Returns the requested content ("text" or "tables") and page numbers (`None` for all
+    pages), or `None` if the query is not structured. Raises a `ValueError` for invalid
+    page numbers (see `parse_page_numbers()`).
+    """
+    match = STRUCTURED_QUERY_REGEX.match(" ".join(query.split()).casefold())
+    if not match:
+        return None
+    content, pages = match.groups()
+    return content, parse_page_numbers(pages) if pages else None
+
+
+def iter_pages(path, page_numbers=None):
+    """
+    Extract the text and tables of a PDF or .docx file page by page.
+
+    Pages are extracted lazily, one at a time, so that only a single page is held in
+    memory. A .docx file has no pages and is extracted as a single page.
+    """
+    if path.endswith(".docx"):
+        if page_numbers is None or 1 in page_numbers:
+            yield _extract_docx(path)
+        return
+    with pdfplumber.open(path) as pdf:
+        if page_numbers is None:
+            page_numbers = range(1, len(pdf.pages) + 1)
+        for number in page_numbers:
+            if number > len(pdf.pages):
+                break
+            page = pdf.pages[number - 1]
+            try:
+                yield Page(
+                    number=number,
+                    text=page.extract_text() or "",
+                    tables=page.extract_tables(),
+                )
+            finally:
+                page.close()  # Frees the cached layout of the page
+
+
+@dataclass(frozen=True)
+class PageWindow:
+    """Pages `start` to `end` extracted together, of which rows on pages `first_owned` to `last_owned` are kept."""
+
+    start: int
+    end: int
+    first_owned: int
+    last_owned: int
+
+
+def page_count(path):
+    """Get the number of pages of a PDF file; other files are handled as a single page."""
+    if not path.endswith(".pdf"):
+        return 1
+    pdf = pypdfium2.PdfDocument(path)
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+
+def page_windows(count, window_pages, overlap_pages):
+    """
+    Split `count` pages into windows of `window_pages` pages, each overlapping the previous
+    one by `overlap_pages` pages.
+
+    The overlap gives context, e.g., to tables continued across the border of windows. Each
+    page is owned by exactly one window, which is the one its rows are taken from: pages in
+    an overlap are split between the two windows.
+    """
+    if window_pages < 1:
+        raise ValueError("The window must have at least 1 page.")
+    if not 0 <= overlap_pages < window_pages:
+        raise ValueError("The overlap must be at least 0 and smaller than the window.")
+    step = window_pages - overlap_pages
+    starts = range(1, max(count - overlap_pages, 1) + 1, step)
+    first_owned = [1] + [start + overlap_pages // 2 for start in starts[1:]]
+    return [
+        PageWindow(
+            start=start,
+            end=min(start + window_pages - 1, count),
+            first_owned=first,
+            last_owned=next_first - 1,
+        )
+        for start, first, next_first in zip(starts, first_owned, first_owned[1:] + [count + 1])
+    ]
+
+
+def pdf_window_data_url(path, start, end):
+    """Get pages `start` to `end` of a PDF file as PDF data URL, e.g., to pass them to the model."""
+    pdf = pypdfium2.PdfDocument(path)
+    window = pypdfium2.PdfDocument.new()
+    try:
+        window.import_pages(pdf, list(range(start - 1, end)))
+        buffer = io.BytesIO()
+        window.save(buffer)
+    finally:
+        window.close()
+        pdf.close()
+    return "data:application/pdf;base64," + base64.b64encode(buffer.getvalue()).decode()
+
+
+def render_page(path, number):
+    """Render a PDF page as image, e.g., to extract a scanned page with the model."""
+    pdf = pypdfium2.PdfDocument(path)
+    try:
+        return pdf[number - 1].render(scale=RENDER_SCALE).to_pil()
+    finally:
+        pdf.close()
+
+
+def format_pages(pages, content):
+    """Format the text of pages as plain text or their tables as JSON."""
+    if content == "tables":
+        return json.dumps(
+            [
+                {"page": page.number, "rows": rows}
+                for page in pages
+                for rows in page.tables
+            ],
+            ensure_ascii=False,
+        )
+    return "\n\n".join(f"--- Page {page.number} ---\n{page.text}" for page in pages)
+
+
+def _extract_docx(path):
+    document = docx.Document(path)
+    paragraphs = [paragraph.text for paragraph in document.paragraphs]
+    tables = [
+        [[cell.text for cell in row.cells] for row in table.rows]
+        for table in document.tables
+    ]
+    return Page(number=1, text="\n".join(paragraphs), tables=tables)
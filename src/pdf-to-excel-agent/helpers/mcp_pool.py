@@ -0,0 +1,250 @@
+import asyncio
+import logging
+import threading
+import time
+
+from fastmcp import Client
+
+logger = logging.getLogger(__name__)
+
+
+class _Session:
+    """A connection to a server process, running in its own task until `stop` is set."""
+
+    def __init__(self):
+        self.client = None
+        self.task = None
+        self.stop = None
+        self.last_used = 0.0
+
+
+class McpSessionPool:
+    """
+    A pool of warm sessions of the MCP servers of `config` (e.g., an `MCPConfig`).
+
+    It can be passed as `mcp_client` to a `ToolCollection` instead of a `fastmcp.Client`,
+    which connects (i.e., spawns stdio servers and does the handshake) and lists the tools
+    again for every tool call. Instead, up to `size` connected clients are kept alive
+    across tool calls and tasks, and the list of tools is fetched once.
+
+    Sessions are connected on first use and pinged before use if they have not been used
+    for `health_check_interval` seconds; sessions that fail the ping are reconnected.
+    Sessions idle for more than `idle_timeout` seconds are disconnected to free the server
+    processes and reconnected when needed again.
+
+    The clients live on an event loop in a background thread, so that they outlive the
+    event loops that the tool calls are made from. Call `close()` (or use the pool as
+    context manager) to disconnect all sessions.
+    """
+
+    def __init__(
+        self,
+        config,
+        size=1,
+        idle_timeout=300,
+        health_check_interval=30,
+        connect_timeout=60,
+        client_factory=Client,
+    ):
+        self._config = config
+        self._idle_timeout = idle_timeout
+        self._health_check_interval = health_check_interval
+        self._connect_timeout = connect_timeout
+        self._client_factory = client_factory
+        self._sessions = [_Session() for _ in range(size)]
+        self._tools = None
+        self._closed = False
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="mcp-session-pool", daemon=True
+        )
+        self._thread.start()
+        self._idle = self._submit(self._create_idle_queue()).result()
+        self._evictor = asyncio.run_coroutine_threadsafe(self._evict_idle(), self._loop)
+
+    # --- McpClientProtocol ---
+
+    async def __aenter__(self):
+        return self  # Sessions are kept open across `async with` blocks
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        pass
+
+    async def list_tools(self):
+        return await asyncio.wrap_future(self._submit(self._list_tools()))
+
+    async def call_tool(
+        self,
+        name,
+        arguments=None,
+        timeout=None,
+        progress_handler=None,
+        raise_on_error=True,
+    ):
+        return await asyncio.wrap_future(
+            self._submit(
+                self._call_tool(name, arguments, timeout, progress_handler, raise_on_error)
+            )
+        )
+
+    # --- Lifecycle ---
+
+    def warm_up(self):
+        """Connect all sessions and fetch the tools now instead of on first use."""
+        self._submit(self._warm_up()).result()
+
+    def refresh_tools(self):
+        self._tools = None
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._evictor.cancel()
+        self._submit(self._disconnect_all()).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    # --- Implementation, running on the loop of the pool ---
+
+    def _submit(self, coro):
+        if self._loop.is_closed():
+            coro.close()
+            raise RuntimeError("The MCP session pool has been closed")
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    async def _create_idle_queue(self):
+        idle = asyncio.Queue()
+        for session in self._sessions:
+            idle.put_nowait(session)
+        return idle
+
+    async def _list_tools(self):
+        if self._tools is None:
+            session = await self._acquire()
+            try:
+                self._tools = await session.client.list_tools()
+            finally:
+                self._release(session)
+        return self._tools
+
+    async def _call_tool(self, name, arguments, timeout, progress_handler, raise_on_error):
+        session = await self._acquire()
+        try:
+            return await session.client.call_tool(
+                name,
+                arguments,
+                timeout=timeout,
+                progress_handler=progress_handler,
+                raise_on_error=raise_on_error,
+            )
+        except Exception:
+            # Reconnect next time if the error is due to the server, e.g., it crashed
+            if not await self._is_healthy(session):
+                logger.warning("Disconnecting MCP session that failed the health check")
+                await self._disconnect(session)
+            raise
+        finally:
+            self._release(session)
+
+    async def _warm_up(self):
+        sessions = [await self._acquire() for _ in self._sessions]
+        try:
+            if self._tools is None:
+                self._tools = await sessions[0].client.list_tools()
+        finally:
+            for session in sessions:
+                self._release(session)
+
+    async def _acquire(self):
+        session = await self._idle.get()
+        try:
+            if session.client is None or not session.client.is_connected():
+                await self._disconnect(session)
+                await self._connect(session)
+            elif time.monotonic() - session.last_used > self._health_check_interval:
+                if not await self._is_healthy(session):
+                    logger.warning("Reconnecting MCP session that failed the health check")
+                    await self._disconnect(session)
+                    await self._connect(session)
+        except BaseException:
+            self._release(session)
+            raise
+        return session
+
+    def _release(self, session):
+        session.last_used = time.monotonic()
+        self._idle.put_nowait(session)
+
+    async def _is_healthy(self, session):
+        try:
+            return await asyncio.wait_for(
+                session.client.ping(), self._health_check_interval
+            )
+        except Exception:
+            return False
+
+    async def _connect(self, session):
+        connected = asyncio.Event()
+        session.stop = asyncio.Event()
+        task = asyncio.create_task(self._run_session(session, connected))
+        waiter = asyncio.create_task(connected.wait())
+        await asyncio.wait(
+            [task, waiter],
+            timeout=self._connect_timeout,
+            return_when=asyncio.FIRST_COMPLETED,
+        )
+        waiter.cancel()
+        if connected.is_set():
+            session.task = task
+            return
+        session.client = None
+        task.cancel()
+        try:
+            await task  # Raises the error if connecting failed
+        except asyncio.CancelledError:
+            raise TimeoutError("Connecting to the MCP server timed out") from None
+
+    async def _run_session(self, session, connected):
+        # Entered and exited in the same task, as required by the transports of fastmcp
+        async with self._client_factory(self._config) as client:
+            session.client = client
+            connected.set()
+            await session.stop.wait()
+
+    async def _disconnect(self, session):
+        task, session.task, session.client = session.task, None, None
+        if task is None:
+            return
+        session.stop.set()
+        try:
+            await asyncio.wait_for(task, self._connect_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Disconnecting from the MCP server timed out")
+        except Exception:
+            logger.warning("Failed to disconnect from the MCP server", exc_info=True)
+
+    async def _disconnect_all(self):
+        await asyncio.gather(*(self._disconnect(session) for session in self._sessions))
+
+    async def _evict_idle(self):
+        while True:
+            await asyncio.sleep(min(self._idle_timeout, self._health_check_interval))
+            now = time.monotonic()
+            # Only sessions that are not in use are in the queue
+            idle = [self._idle.get_nowait() for _ in range(self._idle.qsize())]
+            try:
+                for session in idle:
+                    if session.task is not None and now - session.last_used > self._idle_timeout:
+                        logger.info("Disconnecting idle MCP session")
+                        await self._disconnect(session)
+            finally:
+                for session in idle:
+                    self._idle.put_nowait(session)
@@ -1,17 +1,80 @@
+import json
 import os
+import re
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
-from askui import VisionAgent
+import openpyxl
+from openpyxl.utils.cell import get_column_letter, range_boundaries
+
+from askui import ResponseSchemaBase, VisionAgent
 from askui.models.shared.tools import Tool
 
+from helpers.cache import ExtractionCache
+from helpers.extraction import (
+    LOCAL_FILE_EXTENSIONS,
+    Page,
+    format_pages,
+    iter_pages,
+    page_count,
+    page_windows,
+    parse_structured_query,
+    pdf_window_data_url,
+    render_page,
+)
+
+SUPPORTED_FILE_EXTENSIONS = (".pdf", ".docx", ".doc")
+# Numbers as written by people, excluding ones with leading zeros like IDs or ZIP codes
+NUMBER_REGEX = re.compile(r"^-?(0|[1-9]\d*)(\.\d+)?$")
+STRUCTURED_QUERIES_DESCRIPTION = 'The queries "text" and "tables", optionally followed by a page range like "of pages 1-3, 5", are answered directly from the text layer of the file, which is much faster than other queries. Tables are returned as JSON.'
+SCANNED_PAGE_TEXT_QUERY = "Extract all text on this page in reading order."
+SCANNED_PAGE_TABLES_QUERY = "Extract all tables on this page. Each table is a list of rows, each row a list of cell texts."
+
+ALL_ROWS_QUERY = "Extract the rows of all tables."
+WINDOW_ROWS_QUERY = "{query}\nReturn each row as a list of cell texts together with the number of the page (1 to {pages}) of this document it is on."
+
+
+class PageTables(ResponseSchemaBase):
+    tables: list[list[list[str]]]
+
+
+class PageRow(ResponseSchemaBase):
+    page: int
+    cells: list[str]
+
+
+class WindowRows(ResponseSchemaBase):
+    rows: list[PageRow]
+
+
 class AskUIGetFromFileTool(Tool):
     """
     A tool that can be used to get information from a file based on the provided query.
+
+    All queries are answered by a single `VisionAgent`, either the given `agent` or one
+    created on first use and released by `close()`. Answers are cached by file content
+    and query (see `ExtractionCache`), so asking the same question about the same file
+    again does not call the model.
+
+    Structured queries for the text or tables of PDF and .docx files (see
+    `parse_structured_query()`) are answered from their text layer without calling the
+    model, except for scanned pages, which are rendered and passed to the model one by one.
     """
 
-    def __init__(self, absolute_source_file_parent_directory_name):
+    def __init__(
+        self,
+        absolute_source_file_parent_directory_name,
+        agent=None,
+        cache_size=256,
+        cache_dir=None,
+        max_workers=4,
+    ):
         super().__init__(
             name="askui_get_from_file_tool",
-            description="It reads and extracts information from a PDF or office document file based on the provided query",
+            description=f"It reads and extracts information from a PDF or office document file based on the provided query. {STRUCTURED_QUERIES_DESCRIPTION}",
             input_schema={
                 "type": "object",
                 "properties": {
@@ -30,16 +93,456 @@ class AskUIGetFromFileTool(Tool):
         self._absolute_source_file_parent_directory_name = (
             absolute_source_file_parent_directory_name
         )
+        self._agent = agent
+        self._closed = False
+        self._agent_lock = threading.Lock()
+        self._cache = ExtractionCache(max_entries=cache_size, cache_dir=cache_dir)
+        self._max_workers = max_workers
 
     def __call__(self, query: str, file_path: str) -> str:
+        absolute_file_path, error = self._resolve(file_path)
+        if error:
+            return error
+        return self._get(query, absolute_file_path)
+
+    def get_many(self, queries, file_path):
+        """Answer `queries` about one file concurrently, returning the answers in the order of `queries`."""
+        absolute_file_path, error = self._resolve(file_path)
+        if error:
+            return [error] * len(queries)
+        # Each distinct question is only sent to the model once
+        unique_queries = {self._cache.key(absolute_file_path, q): q for q in queries}
+        with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+            answers = dict(
+                zip(
+                    unique_queries,
+                    executor.map(
+                        lambda q: self._get(q, absolute_file_path),
+                        unique_queries.values(),
+                    ),
+                )
+            )
+        return [answers[self._cache.key(absolute_file_path, q)] for q in queries]
+
+    def iter_rows(self, file_path, query=None, window_pages=10, overlap_pages=1):
+        """
+        Extract rows from a file in windows of pages (see `page_windows()`), yielding them in
+        document order as `{"page": ..., "cells": [...]}` while later windows are still
+        being extracted.
+
+        Without `query`, the rows of all tables are extracted from the text layer (see
+        `parse_structured_query()`), otherwise the model extracts the rows described by
+        `query` from each window. At most `max_workers` windows are extracted at a time,
+        so memory usage does not grow with the size of the file.
+        """
+        absolute_file_path, error = self._resolve(file_path)
+        if error:
+            raise ValueError(error)
+        if query is None and not absolute_file_path.endswith(LOCAL_FILE_EXTENSIONS):
+            query = ALL_ROWS_QUERY
+        if query is None:
+            overlap_pages = 0  # Tables are extracted page by page, i.e., without context
+        windows = page_windows(
+            page_count(absolute_file_path), window_pages, overlap_pages
+        )
+        with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+            futures = deque()
+            try:
+                for window in windows:
+                    futures.append(
+                        executor.submit(
+                            self._get_window_rows, absolute_file_path, query, window
+                        )
+                    )
+                    if len(futures) > self._max_workers:
+                        yield from futures.popleft().result()
+                while futures:
+                    yield from futures.popleft().result()
+            finally:
+                for future in futures:
+                    future.cancel()
+
+    def close(self):
+        """Release the agent of the tool; an agent passed in is closed by its owner."""
+        with self._agent_lock:
+            self._agent = None
+            self._closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _resolve(self, file_path):
         absolute_file_path = os.path.join(
             self._absolute_source_file_parent_directory_name, file_path
         )
         if not os.path.exists(absolute_file_path):
-            return f"File not found. At {absolute_file_path}."
-        if not absolute_file_path.endswith((".pdf", ".docx", ".doc")):
-            return "Only files with .pdf, .docx, or .doc extensions are supported."
-        return VisionAgent().get(query, source=absolute_file_path, response_schema=str)
+            return absolute_file_path, f"File not found. At {absolute_file_path}."
+        if not absolute_file_path.endswith(SUPPORTED_FILE_EXTENSIONS):
+            return (
+                absolute_file_path,
+                "Only files with .pdf, .docx, or .doc extensions are supported.",
+            )
+        return absolute_file_path, None
+
+    def _get_agent(self):
+        with self._agent_lock:
+            if self._closed:
+                raise RuntimeError("The tool has been closed")
+            if self._agent is None:
+                # Only used to extract data from files, which needs the model but not the
+                # controller, so it is not opened (i.e., connected to the controller) and
+                # does not need to be closed, as opposed to the agent operating the desktop
+                self._agent = VisionAgent()
+            return self._agent
+
+    def _get(self, query, absolute_file_path):
+        key = self._cache.key(absolute_file_path, query)
+        answer = self._cache.get(key)
+        if answer is None:
+            structured_query = None
+            if absolute_file_path.endswith(LOCAL_FILE_EXTENSIONS):
+                try:
+                    structured_query = parse_structured_query(query)
+                except ValueError as e:
+                    return str(e)
+            if structured_query:
+                answer = self._get_from_text_layer(absolute_file_path, *structured_query)
+            else:
+                answer = self._get_agent().get(
+                    query, source=absolute_file_path, response_schema=str
+                )
+            self._cache.put(key, answer)
+        return answer
+
+    def _get_window_rows(self, absolute_file_path, query, window):
+        if query is None:
+            tables = json.loads(
+                self._get(f"tables of pages {window.start}-{window.end}", absolute_file_path)
+            )
+            rows = [
+                {"page": table["page"], "cells": cells}
+                for table in tables
+                for cells in table["rows"]
+            ]
+        else:
+            key = self._cache.key(
+                absolute_file_path, f"rows of pages {window.start}-{window.end}: {query}"
+            )
+            rows = self._cache.get(key)
+            if rows is None:
+                source = absolute_file_path
+                if absolute_file_path.endswith(".pdf"):
+                    source = pdf_window_data_url(
+                        absolute_file_path, window.start, window.end
+                    )
+                window_rows = self._get_agent().get(
+                    WINDOW_ROWS_QUERY.format(
+                        query=query, pages=window.end - window.start + 1
+                    ),
+                    source=source,
+                    response_schema=WindowRows,
+                )
+                rows = [
+                    {"page": window.start + row.page - 1, "cells": row.cells}
+                    for row in window_rows.rows
+                ]
+                self._cache.put(key, rows)
+        return [
+            row
+            for row in rows
+            if window.first_owned <= row["page"] <= window.last_owned
+        ]
+
+    def _get_from_text_layer(self, absolute_file_path, content, page_numbers):
+        pages = []
+        for page in iter_pages(absolute_file_path, page_numbers):
+            if page.scanned and absolute_file_path.endswith(".pdf"):
+                page = self._get_scanned_page(absolute_file_path, page.number, content)
+            pages.append(page)
+        if not pages:
+            return f"The file has none of the pages {page_numbers}."
+        return format_pages(pages, content)
+
+    def _get_scanned_page(self, absolute_file_path, number, content):
+        image = render_page(absolute_file_path, number)
+        if content == "tables":
+            page_tables = self._get_agent().get(
+                SCANNED_PAGE_TABLES_QUERY, source=image, response_schema=PageTables
+            )
+            return Page(number=number, text="", tables=page_tables.tables)
+        text = self._get_agent().get(
+            SCANNED_PAGE_TEXT_QUERY, source=image, response_schema=str
+        )
+        return Page(number=number, text=text)
+
+
+class AskUIGetManyFromFileTool(Tool):
+    """
+    A tool that answers multiple queries about a single file at once, see `AskUIGetFromFileTool.get_many()`.
+    """
+
+    def __init__(self, get_from_file_tool):
+        super().__init__(
+            name="askui_get_many_from_file_tool",
+            description=f"It reads and extracts multiple pieces of information from a PDF or office document file at once, one per query. Prefer it over askui_get_from_file_tool when asking more than one question about the same file. {STRUCTURED_QUERIES_DESCRIPTION}",
+            input_schema={
+                "type": "object",
+                "properties": {
+                    "queries": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "The queries describing what information to retrieve from the file.",
+                    },
+                    "file_path": {
+                        "type": "string",
+                        "description": "The name of the file to read and extract information from. It must end with .pdf, .docx, or .doc.",
+                    },
+                },
+                "required": ["queries", "file_path"],
+            },
+        )
+        self._get_from_file_tool = get_from_file_tool
+
+    def __call__(self, queries: list[str], file_path: str) -> str:
+        answers = self._get_from_file_tool.get_many(queries, file_path)
+        return json.dumps(
+            [{"query": q, "answer": a} for q, a in zip(queries, answers)],
+            ensure_ascii=False,
+        )
+
+
+class AskUIExtractRowsToExcelTool(Tool):
+    """
+    A tool that extracts rows from a file window by window and streams them into a new Excel file, see `AskUIGetFromFileTool.iter_rows()`.
+    """
+
+    def __init__(self, get_from_file_tool, absolute_target_file_parent_directory_name):
+        super().__init__(
+            name="askui_extract_rows_to_excel_tool",
+            description="It extracts table rows from a PDF or office document file and writes them into a new Excel file, one row per table row. Long files are processed in windows of pages concurrently. Use it instead of askui_get_from_file_tool to transfer tables of files with many pages.",
+            input_schema={
+                "type": "object",
+                "properties": {
+                    "file_path": {
+                        "type": "string",
+                        "description": "The name of the file to extract rows from. It must end with .pdf, .docx, or .doc.",
+                    },
+                    "target_file": {
+                        "type": "string",
+                        "description": "The name of the Excel file to create. It must end with .xlsx and must not exist yet.",
+                    },
+                    "query": {
+                        "type": "string",
+                        "description": "Optional description of the rows to extract, e.g., the line items of invoices. Without it, all rows of all tables are extracted directly from the text layer of the file, which is much faster.",
+                    },
+                    "sheet_name": {
+                        "type": "string",
+                        "description": "The name of the sheet to write the rows to.",
+                        "default": "Rows",
+                    },
+                    "window_pages": {
+                        "type": "integer",
+                        "description": "The number of pages extracted together.",
+                        "default": 10,
+                    },
+                    "overlap_pages": {
+                        "type": "integer",
+                        "description": "The number of pages shared by subsequent windows, e.g., to extract tables continued on the next page.",
+                        "default": 1,
+                    },
+                },
+                "required": ["file_path", "target_file"],
+            },
+        )
+        self._get_from_file_tool = get_from_file_tool
+        self._absolute_target_file_parent_directory_name = (
+            absolute_target_file_parent_directory_name
+        )
+
+    def __call__(
+        self,
+        file_path: str,
+        target_file: str,
+        query: str | None = None,
+        sheet_name: str = "Rows",
+        window_pages: int = 10,
+        overlap_pages: int = 1,
+    ) -> str:
+        absolute_target_file_path = os.path.join(
+            self._absolute_target_file_parent_directory_name, target_file
+        )
+        if not absolute_target_file_path.endswith(".xlsx"):
+            return "Only files with .xlsx extension are supported as target."
+        if os.path.exists(absolute_target_file_path):
+            return f"File already exists. At {absolute_target_file_path}."
+        start = time.perf_counter()
+        # Rows are written to disk as they are appended instead of being kept in memory
+        workbook = openpyxl.Workbook(write_only=True)
+        sheet = workbook.create_sheet(sheet_name)
+        row_count = 0
+        pages = set()
+        try:
+            for row in self._get_from_file_tool.iter_rows(
+                file_path, query, window_pages, overlap_pages
+            ):
+                sheet.append(row["cells"])
+                pages.add(row["page"])
+                row_count += 1
+        except ValueError as e:
+            return str(e)
+        workbook.save(absolute_target_file_path)
+        return f"Wrote {row_count} rows from {len(pages)} pages of {file_path} to sheet {sheet_name} of {absolute_target_file_path} in {time.perf_counter() - start:.1f}s."
+
+
+class WriteTableToExcelTool(Tool):
+    """
+    A tool that writes a whole table into an Excel file at once and returns a summary of what was written.
+    """
+
+    def __init__(self, absolute_file_parent_directory_name):
+        super().__init__(
+            name="write_table_to_excel_tool",
+            description="It writes a whole table (a list of rows) into a sheet of an Excel file in one step, creating the file from a template if it does not exist yet, and returns a summary of the written cells to verify the result. Prefer it over writing data cell by cell or row by row.",
+            input_schema={
+                "type": "object",
+                "properties": {
+                    "file_path": {
+                        "type": "string",
+                        "description": "The name of the Excel file to write to. It must end with .xlsx.",
+                    },
+                    "rows": {
+                        "type": "array",
+                        "items": {"type": "array", "items": {}},
+                        "description": "The rows of the table, each a list of cell values.",
+                    },
+                    "target": {
+                        "type": "string",
+                        "description": 'The cell to write the first cell of the table to, e.g., "A2", or the range the table must fit into, e.g., "A2:E100".',
+                        "default": "A1",
+                    },
+                    "sheet_name": {
+                        "type": "string",
+                        "description": "The name of the sheet to write to, which is created if it does not exist. Defaults to the active sheet.",
+                    },
+                    "template_file": {
+                        "type": "string",
+                        "description": "The name of an Excel file to copy if file_path does not exist yet, e.g., to keep its headers and formatting.",
+                    },
+                    "template_sheet": {
+                        "type": "string",
+                        "description": "The name of a sheet of the (copied) file to create sheet_name from if it does not exist yet.",
+                    },
+                },
+                "required": ["file_path", "rows"],
+            },
+        )
+        self._absolute_file_parent_directory_name = absolute_file_parent_directory_name
+
+    def __call__(
+        self,
+        file_path: str,
+        rows: list[list],
+        target: str = "A1",
+        sheet_name: str | None = None,
+        template_file: str | None = None,
+        template_sheet: str | None = None,
+    ) -> str:
+        absolute_file_path = os.path.join(
+            self._absolute_file_parent_directory_name, file_path
+        )
+        if not absolute_file_path.endswith(".xlsx"):
+            return "Only files with .xlsx extension are supported."
+        if not os.path.isdir(os.path.dirname(absolute_file_path)):
+            return f"Directory not found. At {os.path.dirname(absolute_file_path)}."
+        try:
+            min_col, min_row, max_col, max_row = range_boundaries(target.upper())
+            if min_col is None or min_row is None:
+                raise ValueError(target)
+        except ValueError:
+            return f"Invalid target {target}. Expected a cell like A2 or a range like A2:E100."
+        if ":" not in target:
+            max_col = max_row = None  # The table starts at the cell and is not limited
+        width = max((len(row) for row in rows), default=0)
+        if max_row is not None and min_row + len(rows) - 1 > max_row:
+            return f"{len(rows)} rows do not fit into {target}."
+        if max_col is not None and min_col + width - 1 > max_col:
+            return f"{width} columns do not fit into {target}."
+
+        if os.path.exists(absolute_file_path):
+            workbook = openpyxl.load_workbook(absolute_file_path)
+        elif template_file:
+            absolute_template_file_path = os.path.join(
+                self._absolute_file_parent_directory_name, template_file
+            )
+            if not os.path.exists(absolute_template_file_path):
+                return f"File not found. At {absolute_template_file_path}."
+            workbook = openpyxl.load_workbook(absolute_template_file_path)
+        else:
+            workbook = openpyxl.Workbook()
+        if sheet_name is None:
+            sheet = workbook.active
+        elif sheet_name in workbook.sheetnames:
+            sheet = workbook[sheet_name]
+        elif template_sheet:
+            if template_sheet not in workbook.sheetnames:
+                return f"Sheet {template_sheet} not found. Sheets: {workbook.sheetnames}."
+            sheet = workbook.copy_worksheet(workbook[template_sheet])
+            sheet.title = sheet_name
+        else:
+            sheet = workbook.create_sheet(sheet_name)
+
+        numeric_totals = {}
+        empty_cells = 0
+        for row_offset, row in enumerate(rows):
+            for col_offset, value in enumerate(row):
+                if isinstance(value, str) and NUMBER_REGEX.match(value.strip()):
+                    value = float(value) if "." in value else int(value)
+                if value is None or value == "":
+                    empty_cells += 1
+                    value = None
+                elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                    column = col_offset + min_col
+                    numeric_totals[column] = numeric_totals.get(column, 0) + value
+                sheet.cell(row=min_row + row_offset, column=min_col + col_offset, value=value)
+
+        # Save to a temporary file first so that the file is never left half written
+        try:
+            fd, tmp_path = tempfile.mkstemp(
+                dir=os.path.dirname(absolute_file_path), suffix=".xlsx"
+            )
+            os.close(fd)
+            try:
+                workbook.save(tmp_path)
+                os.replace(tmp_path, absolute_file_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        except OSError as e:
+            return f"Failed to write {absolute_file_path}: {e}"
+
+        if not rows:
+            return f"Wrote no rows to sheet {sheet.title} of {absolute_file_path}."
+        last_col = min_col + max(width, 1) - 1
+        last_row = min_row + len(rows) - 1
+        written_range = f"{get_column_letter(min_col)}{min_row}:{get_column_letter(last_col)}{last_row}"
+        # Read back the first and last row as written, i.e., with numbers converted
+        first_row, last_row_values = (
+            [sheet.cell(row=row, column=column).value for column in range(min_col, last_col + 1)]
+            for row in (min_row, last_row)
+        )
+        totals = ", ".join(
+            f"{get_column_letter(column)}={total:g}"
+            for column, total in sorted(numeric_totals.items())
+        )
+        return (
+            f"Wrote {len(rows)} rows x {width} columns to {sheet.title}!{written_range} of {absolute_file_path}"
+            f" ({empty_cells} empty cells). First row: {json.dumps(first_row, ensure_ascii=False, default=str)}."
+            f" Last row: {json.dumps(last_row_values, ensure_ascii=False, default=str)}."
+            + (f" Numeric column totals: {totals}." if totals else "")
+        )
 
 
 class PrintTool(Tool):
@@ -1,18 +1,26 @@
 from pathlib import Path
-from fastmcp import Client
 from fastmcp.mcp_config import MCPConfig
 
 from askui import VisionAgent
 from askui.models.shared.tools import ToolCollection
 from askui.tools.mcp.config import StdioMCPServer
 
-from helpers.tools import AskUIGetFromFileTool, PrintTool
+from helpers.mcp_pool import McpSessionPool
+from helpers.tools import (
+    AskUIExtractRowsToExcelTool,
+    AskUIGetFromFileTool,
+    AskUIGetManyFromFileTool,
+    PrintTool,
+    WriteTableToExcelTool,
+)
 
 
 def main():
     # --- Paths ---
     base_dir = Path(__file__).parent.resolve()
     source_dir = base_dir / "source_files"
+    # Answers extracted from files, reused across runs as long as the files do not change
+    cache_dir = base_dir / ".cache" / "extractions"
 
     pdf_source = "demo_data.pdf"
     excel_template_file = "demo_template.xlsx"
@@ -31,17 +39,24 @@ def main():
             )
         }
     )
-    client = Client(excel_mcp_server)
-    custom_tools = ToolCollection(mcp_client=client)
-
-    # --- Add custom tools ---
-    custom_tools.append_tool(
-        AskUIGetFromFileTool(str(source_dir)),
-        PrintTool(),
-    )
+    # Keeps the server running across tool calls instead of starting it for each call
+    excel_mcp_pool = McpSessionPool(excel_mcp_server)
+    custom_tools = ToolCollection(mcp_client=excel_mcp_pool)
 
     # --- Run VisionAgent task ---
-    with VisionAgent() as desktop_agent:
+    with excel_mcp_pool, VisionAgent() as desktop_agent:
+        # --- Add custom tools ---
+        # The file tool reuses the session of the desktop agent instead of creating its own
+        get_from_file_tool = AskUIGetFromFileTool(
+            str(source_dir), agent=desktop_agent, cache_dir=str(cache_dir)
+        )
+        custom_tools.append_tool(
+            get_from_file_tool,
+            AskUIGetManyFromFileTool(get_from_file_tool),
+            AskUIExtractRowsToExcelTool(get_from_file_tool, str(source_dir)),
+            WriteTableToExcelTool(str(source_dir)),
+            PrintTool(),
+        )
         desktop_agent.act(
             f"""
             Read "{pdf_source}" and "{excel_template_file}".
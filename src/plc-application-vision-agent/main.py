@@ -1,40 +1,82 @@
 from askui import VisionAgent
+import json
+import os
 import subprocess
+import urllib.request
+
+from screen_stability import WaitForStableScreenTool, wait_for_stable_screen
+
+# State endpoint of the PLC application, see `--state-port` of plc_desktop.py
+PLC_STATE_URL = os.environ.get("PLC_STATE_URL", "http://127.0.0.1:8765/state")
+# Whether to also ask the agent if the state is served to measure its vision accuracy
+CHECK_VISION = os.environ.get("CHECK_VISION") == "1"
+
+
+def get_plc_state():
+    """Get the true state of the PLC application or None if it is not served."""
+    try:
+        with urllib.request.urlopen(PLC_STATE_URL, timeout=1) as response:
+            return json.load(response)
+    except OSError:
+        return None
+
+
+def check_vision(is_equal, state):
+    # Compare what the agent saw with the true state to measure its vision accuracy
+    slider_level = round(state["manual_level"])
+    tank_level = round(state["tank_level"])
+    print(f"ℹ️ True state: slider at {slider_level}%, tank level at {tank_level}%")
+    if is_equal == (slider_level == tank_level):
+        print("✅ Agent saw the state correctly")
+    else:
+        print("❌ Agent saw the state incorrectly")
+
+
+def ask_levels_equal(agent):
+    # Asks the model, i.e., only done if the true state is not served or CHECK_VISION is set
+    wait_for_stable_screen(agent)
+    is_equal = agent.get("Is the Handle of the slider equal the procentage of the water tank level?", response_schema=bool)
+    if is_equal:
+        print("✅ Slider and water tank levels are synchronized")
+    else:
+        print("❌ Slider and water tank levels are not synchronized")
+    return is_equal
+
 
 with VisionAgent() as agent:
 
     # Manual mode test
 
+    wait_for_stable_screen(agent)
     agent.act("""
-    wait until you the screen is fully loaded.
     You are currently looking at a PLC screen.
     You are in Manual mode. 
     You need to pull the manual tank level to 50%
-    """)
+    """, tools=[WaitForStableScreenTool(agent)])
 
-    is_equal = agent.get("Is the Handle of the slider equal the procentage of the water tank level?", response_schema=bool)
-    if is_equal:
-        print("✅ Slider and water tank levels are synchronized")
+    state = get_plc_state()
+    if state is not None:
+        if CHECK_VISION:
+            check_vision(ask_levels_equal(agent), state)
+        assert not state["auto_mode"] and round(state["tank_level"]) == 50, "The tank level is not at 50% in manual mode"
     else:
-        print("❌ Slider and water tank levels are not synchronized")
-    
-    assert is_equal, "The slider is not at the correct level"
+        assert ask_levels_equal(agent), "The slider is not at the correct level"
 
     # Auto mode test
 
+    wait_for_stable_screen(agent)
     agent.act("""
-    Wait until you see the screen is fully loaded.
     You are currently looking at a PLC screen.
     You have to activate auto mode.
     Then you need to click on Stop Pump
-    Wait until it reaches 0%
+    Wait until it reaches 0% using the wait_for_stable_screen_tool with a timeout of 120 seconds, as the tank level keeps changing until then
     If there is a pop up, simulate closing it.
-    """)
+    """, tools=[WaitForStableScreenTool(agent)])
 
-    is_equal = agent.get("Is the Handle of the slider equal the procentage of the water tank level?", response_schema=bool)
-    if is_equal:
-        print("✅ Slider and water tank levels are synchronized")
+    state = get_plc_state()
+    if state is not None:
+        if CHECK_VISION:
+            check_vision(ask_levels_equal(agent), state)
+        assert state["auto_mode"] and state["tank_level"] == 0.0, "The tank was not drained in auto mode"
     else:
-        print("❌ Slider and water tank levels are not synchronized")
-    
-    assert is_equal, "The slider is not at the correct level"
\ No newline at end of file
+        assert ask_levels_equal(agent), "The slider is not at the correct level"
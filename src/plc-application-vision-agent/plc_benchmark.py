@@ -0,0 +1,143 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+# Render without a display; must be set before the QApplication is created
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtCore import QBuffer, QIODevice
+from PySide6.QtGui import QImageWriter
+from PySide6.QtWidgets import QApplication
+
+from plc_desktop import PLCApp
+from plc_engine import Scenario, SimulationClock
+
+# Fills the tank to the high level and drains it afterwards so that frames change
+DEFAULT_SCENARIO = Scenario(
+    state={"tank_level": 50.0},
+    events=[{"at": 0.0, "press": "start_pump"}],
+)
+FORMATS = ("png", "webp")
+
+
+def summarize(values, scale=1.0):
+    values = sorted(value * scale for value in values)
+    return {
+        "mean": statistics.fmean(values),
+        "p50": values[len(values) // 2],
+        "p95": values[min(len(values) - 1, int(len(values) * 0.95))],
+        "max": values[-1],
+    }
+
+
+def encode(image, image_format, quality):
+    buffer = QBuffer()
+    buffer.open(QIODevice.WriteOnly)
+    image.save(buffer, image_format, quality)
+    return buffer.size()
+
+
+def benchmark_size(width, height, frames, speed, scenario, quality):
+    """Run the app at a window size for `frames` frames and measure scans, updates, rendering and encoding."""
+    clock = SimulationClock(speed, start=0)
+    # Modal popups would block the benchmark
+    win = PLCApp(clock=clock, scenario=scenario, empty_tank_popup=False)
+    win.timer.stop()  # Frames are stepped by the benchmark instead
+    win.resize(width, height)
+    win.show()
+    QApplication.processEvents()
+
+    scan_times = []
+    scan = win.state.scan
+
+    def timed_scan():
+        start = time.perf_counter()
+        scan()
+        scan_times.append(time.perf_counter() - start)
+
+    win.state.scan = timed_scan
+    formats = [f for f in FORMATS if f.encode() in QImageWriter.supportedImageFormats()]
+    update_times, render_times = [], []
+    encode_times = {f: [] for f in formats}
+    sizes = {f: [] for f in formats}
+    for _ in range(frames):
+        start = time.perf_counter()
+        win.update_plc()
+        QApplication.processEvents()
+        update_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        image = win.grab().toImage()
+        render_times.append(time.perf_counter() - start)
+
+        for image_format in formats:
+            start = time.perf_counter()
+            sizes[image_format].append(encode(image, image_format, quality))
+            encode_times[image_format].append(time.perf_counter() - start)
+
+    result = {
+        "size": [image.width(), image.height()],
+        "frames": frames,
+        "ticks": win.state.engine.ticks,
+        "scan_us": summarize(scan_times, 1e6),
+        "update_ms": summarize(update_times, 1e3),
+        "render_ms": summarize(render_times, 1e3),
+        "encoded": {
+            image_format: {
+                "bytes": summarize(sizes[image_format]),
+                "encode_ms": summarize(encode_times[image_format], 1e3),
+            }
+            for image_format in formats
+        },
+    }
+    win.close()
+    win.deleteLater()
+    QApplication.processEvents()
+    return result
+
+
+def parse_size(value):
+    width, _, height = value.partition("x")
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark rendering and capturing the PLC application offscreen")
+    parser.add_argument("--sizes", default="950x850,1280x1024,1920x1080", help="Comma-separated window sizes (default: 950x850,1280x1024,1920x1080)")
+    parser.add_argument("--frames", type=int, default=200, help="Number of frames per window size (default: 200)")
+    parser.add_argument("--speed", type=float, default=1.0, help="Scans per frame (default: 1)")
+    parser.add_argument("--scenario", help="Scenario to run, see Scenario in plc_engine.py (default: fill and drain the tank)")
+    parser.add_argument("--quality", type=int, default=-1, help="Quality passed to the image encoders, 0-100 (default: -1, i.e., their default)")
+    parser.add_argument("--output", help="Write the results to this file instead of stdout")
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv[:1])
+    results = {
+        "platform": app.platformName(),
+        "speed": args.speed,
+        "quality": args.quality,
+        "sizes": [
+            benchmark_size(
+                width,
+                height,
+                args.frames,
+                args.speed,
+                Scenario.load(args.scenario) if args.scenario else DEFAULT_SCENARIO,
+                args.quality,
+            )
+            for width, height in map(parse_size, args.sizes.split(","))
+        ],
+    }
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
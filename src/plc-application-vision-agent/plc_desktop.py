@@ -1,174 +1,220 @@
+import argparse
 import sys
 import time
 from PySide6.QtWidgets import (QApplication, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QSlider, QProgressBar, QFrame, QListWidget, QCheckBox, QButtonGroup, QRadioButton, QMessageBox)
 from PySide6.QtCore import Qt, QTimer
 import pyqtgraph as pg
 from PySide6.QtGui import QPainter, QColor, QFont, QLinearGradient
+from plc_engine import PLCEngine, RingBuffer, Scenario, SimulationClock, WallClock, EVENTS
+from plc_state_server import StateServer
+
+def _engine_field(name):
+    # Exposes the state of the single tank of the engine as plain Python value
+    return property(
+        lambda self: getattr(self.engine, name)[0].item(),
+        lambda self, value: getattr(self.engine, name).__setitem__(0, value),
+    )
 
 class PLCState:
-    def __init__(self):
-        self.start_pump = False
-        self.stop_pump = False
-        self.high_level = False
-        self.low_level = True
-        self.pump_running = False
-        self.alarm = False
-        self.tank_level = 0.0
-        self.valve_opening = 100.0
-        self.last_start_pump = False
-        self.last_stop_pump = False
-        self.chart_level = []
-        self.chart_valve = []
-        self.max_chart = 30
-        self.event_log = []
-        self.last_alarm = False
-        self.last_pump = False
-        self.auto_mode = True
-        self.manual_valve = True
-        self.manual_level = 0.0
+    start_pump = _engine_field("start_pump")
+    stop_pump = _engine_field("stop_pump")
+    high_level = _engine_field("high_level")
+    low_level = _engine_field("low_level")
+    pump_running = _engine_field("pump_running")
+    alarm = _engine_field("alarm")
+    tank_level = _engine_field("tank_level")
+    valve_opening = _engine_field("valve_opening")
+    last_start_pump = _engine_field("last_start_pump")
+    last_stop_pump = _engine_field("last_stop_pump")
+    last_alarm = _engine_field("last_alarm")
+    auto_mode = _engine_field("auto_mode")
+    manual_valve = _engine_field("manual_valve")
+    manual_level = _engine_field("manual_level")
+
+    def __init__(self, max_chart=30, max_events=10, clock=None, scenario=None):
+        # The simulation itself runs headless, see plc_engine.py
+        self.engine = PLCEngine(1)
+        self.clock = clock or WallClock()
+        self.scenario = scenario
+        if scenario:
+            scenario.apply_state(self.engine)
+        # Chart data of the last max_chart scans and the last max_events events
+        self.chart_level = RingBuffer(max_chart)
+        self.chart_valve = RingBuffer(max_chart)
+        self.event_log = RingBuffer(max_events, dtype=object)
 
     def scan(self):
-        # Tank simulation
-        if self.auto_mode:
-            fill_rate = 0.5 if self.pump_running and self.valve_opening > 0 else 0.0
-            drain_rate = 0.2 if not self.pump_running and self.valve_opening > 0 else 0.0
-            self.tank_level += fill_rate
-            self.tank_level -= drain_rate
-            self.tank_level = max(0.0, min(100.0, self.tank_level))
-            self.valve_opening = 100.0
-        else:
-            # Only allow tank level to change if valve is open
-            if self.manual_valve:
-                self.tank_level = self.manual_level
-            # If valve is closed, keep tank level constant
-            self.valve_opening = 100.0 if self.manual_valve else 0.0
-        # High/Low level sensors auto-update
-        self.high_level = self.tank_level >= 95
-        self.low_level = self.tank_level > 5
-        # Pump logic
-        if self.start_pump and not self.pump_running and not self.high_level:
-            self.pump_running = True
-            self.log_event("Pump started")
-        if self.stop_pump and not self.last_stop_pump:
-            self.pump_running = False
-            self.log_event("Pump stopped (manual)")
-        if self.high_level and self.pump_running:
-            self.pump_running = False
-            self.log_event("Pump stopped (high level)")
-        self.last_start_pump = self.start_pump
-        self.last_stop_pump = self.stop_pump
-        # Alarm logic
-        self.alarm = (self.tank_level > 98 or not self.low_level)
-        if self.alarm and not self.last_alarm:
-            self.log_event("Alarm ON")
-        if not self.alarm and self.last_alarm:
-            self.log_event("Alarm OFF")
-        self.last_alarm = self.alarm
+        if self.scenario:
+            self.scenario.apply_actions(self.engine)
+        self.engine.step()
+        self.clock.advance()
+        for event, msg in EVENTS.items():
+            if self.engine.events[event][0]:
+                self.log_event(msg)
         # Chart data
         self.chart_level.append(self.tank_level)
         self.chart_valve.append(self.valve_opening)
-        if len(self.chart_level) > self.max_chart:
-            self.chart_level.pop(0)
-            self.chart_valve.pop(0)
+
+    def snapshot(self):
+        return {
+            **self.engine.snapshot(),
+            "time": self.clock.now(),
+            "event_log": list(self.event_log.values()),
+        }
 
     def log_event(self, msg):
-        t = time.strftime("%H:%M:%S")
+        t = time.strftime("%H:%M:%S", time.localtime(self.clock.now()))
         self.event_log.append(f"[{t}] {msg}")
-        if len(self.event_log) > 10:
-            self.event_log.pop(0)
+
+COLOR_TANK_OUTLINE = QColor('#2563eb')
+COLOR_TANK = QColor('#e0e7ef')
+COLOR_WATER = QColor('#38bdf8')
+COLOR_WATER_TOP = QColor('#0ea5e9')
+COLOR_ON = QColor('#22c55e')
+COLOR_OFF = QColor('#b0b8c1')
+COLOR_ALARM = QColor('#ef4444')
+COLOR_ALARM_OUTLINE = QColor('#991b1b')
+COLOR_TEXT = QColor('black')
+COLOR_TEXT_OUTLINE = QColor('white')
 
 class TankWidget(QWidget):
     def __init__(self, plc_state):
         super().__init__()
         self.plc_state = plc_state
         self.setMinimumHeight(180)
+        # Fonts and brushes do not depend on the state and geometry only on the size, so
+        # they are created once instead of on every paint
+        self.percent_font = QFont(self.font())
+        self.percent_font.setPointSize(32)
+        self.percent_font.setBold(True)
+        self.alarm_font = QFont('Arial', 14, QFont.Bold)
+        self.label_font = QFont('Arial', 10)
+        self.device_font = QFont('Arial', 12, QFont.Bold)
+        # Only the end points of the gradient change with the water level
+        self.water_gradient = QLinearGradient()
+        self.water_gradient.setColorAt(0, COLOR_WATER)
+        self.water_gradient.setColorAt(1, COLOR_WATER_TOP)
+        self.update_geometry()
+        self.painted_state = None
 
-    def paintEvent(self, event):
-        painter = QPainter(self)
+    def resizeEvent(self, event):
+        self.update_geometry()
+        super().resizeEvent(event)
+
+    def update_geometry(self):
         w, h = self.width(), self.height()
         margin = 40
-        tank_width = w // 2
-        tank_height = h // 3
-        tank_left = (w - tank_width) // 2
-        tank_top = margin + 40
+        self.tank_width = w // 2
+        self.tank_height = h // 3
+        self.tank_left = (w - self.tank_width) // 2
+        self.tank_top = margin + 40
+        sensor_circle_d = 28
+        self.sensor_circle_d = sensor_circle_d
+        self.sensor_x = self.tank_left - 60
+        self.sensor_y_high = self.tank_top
+        self.sensor_y_low = self.tank_top + self.tank_height - sensor_circle_d
+        self.label_padding = 16
+        self.pump_x = self.tank_left + 30
+        self.pump_y = self.tank_top + self.tank_height + 40
+        self.valve_x = self.tank_left + self.tank_width - 66
+        self.valve_y = self.tank_top + self.tank_height + 40
+
+    def get_visual_state(self):
+        # Everything paintEvent depends on besides the size
+        state = self.plc_state
+        return (
+            int(self.tank_height * state.tank_level / 100.0),
+            f"{state.tank_level:.1f}%",
+            state.alarm,
+            state.high_level,
+            state.low_level,
+            state.pump_running,
+            state.valve_opening > 0,
+        )
+
+    def refresh(self):
+        # Only repaint if anything visible changed since the last paint
+        if self.get_visual_state() != self.painted_state:
+            self.update()
+
+    def paintEvent(self, event):
+        self.painted_state = self.get_visual_state()
+        water_h, percent_text, alarm, high_level, low_level, pump_running, valve_open = self.painted_state
+        painter = QPainter(self)
+        tank_left, tank_top = self.tank_left, self.tank_top
+        tank_width, tank_height = self.tank_width, self.tank_height
         # Draw tank outline
-        painter.setPen(QColor('#2563eb'))
-        painter.setBrush(QColor('#e0e7ef'))
+        painter.setPen(COLOR_TANK_OUTLINE)
+        painter.setBrush(COLOR_TANK)
         painter.drawRect(tank_left, tank_top, tank_width, tank_height)
         # Draw water level with gradient
-        level = self.plc_state.tank_level / 100.0
-        water_h = int(tank_height * level)
         if water_h > 0:
-            gradient = QLinearGradient(tank_left, tank_top + tank_height, tank_left, tank_top + tank_height - water_h)
-            gradient.setColorAt(0, QColor('#38bdf8'))
-            gradient.setColorAt(1, QColor('#0ea5e9'))
-            painter.setBrush(gradient)
+            self.water_gradient.setStart(tank_left, tank_top + tank_height)
+            self.water_gradient.setFinalStop(tank_left, tank_top + tank_height - water_h)
+            painter.setBrush(self.water_gradient)
         else:
-            painter.setBrush(QColor('#38bdf8'))
+            painter.setBrush(COLOR_WATER)
         painter.drawRect(tank_left+2, tank_top + tank_height - water_h, tank_width-4, water_h)
         # Draw tank level number (large, bold, outlined, always readable)
-        percent_text = f"{self.plc_state.tank_level:.1f}%"
-        font = painter.font()
-        font.setPointSize(32)
-        font.setBold(True)
-        painter.setFont(font)
+        painter.setFont(self.percent_font)
+        painter.setPen(COLOR_TEXT_OUTLINE)
         for dx, dy in [(-2,0),(2,0),(0,-2),(0,2)]:
-            painter.setPen(QColor('white'))
             painter.drawText(tank_left, tank_top + tank_height//2 + dy, tank_width, 50, Qt.AlignCenter, percent_text)
-        painter.setPen(QColor('black'))
+        painter.setPen(COLOR_TEXT)
         painter.drawText(tank_left, tank_top + tank_height//2, tank_width, 50, Qt.AlignCenter, percent_text)
         # Draw alarm (top center above tank)
-        if self.plc_state.alarm:
-            painter.setBrush(QColor('#ef4444'))
-            painter.setPen(QColor('#991b1b'))
+        if alarm:
+            painter.setBrush(COLOR_ALARM)
+            painter.setPen(COLOR_ALARM_OUTLINE)
             painter.drawEllipse(tank_left + tank_width//2 - 18, tank_top - 50, 36, 36)
-            painter.setFont(QFont('Arial', 14, QFont.Bold))
+            painter.setFont(self.alarm_font)
             painter.drawText(tank_left + tank_width//2 - 60, tank_top - 60, 120, 20, Qt.AlignCenter, "ALARM!")
         # Draw sensors (left of tank, vertically aligned)
-        label_font = QFont('Arial', 10)
-        painter.setFont(label_font)
-        sensor_circle_d = 28
-        sensor_x = tank_left - 60
-        sensor_y_high = tank_top
-        sensor_y_low = tank_top + tank_height - sensor_circle_d
-        label_padding = 16
+        painter.setFont(self.label_font)
+        sensor_circle_d = self.sensor_circle_d
+        sensor_x = self.sensor_x
+        label_x = sensor_x + sensor_circle_d + self.label_padding
         # High Level
-        painter.setBrush(QColor('#22c55e') if self.plc_state.high_level else QColor('#b0b8c1'))
-        painter.setPen(QColor('black'))
-        painter.drawEllipse(sensor_x, sensor_y_high, sensor_circle_d, sensor_circle_d)
-        painter.drawText(sensor_x + sensor_circle_d + label_padding, sensor_y_high + sensor_circle_d//2 + 5, "High Sensor")
+        painter.setBrush(COLOR_ON if high_level else COLOR_OFF)
+        painter.setPen(COLOR_TEXT)
+        painter.drawEllipse(sensor_x, self.sensor_y_high, sensor_circle_d, sensor_circle_d)
+        painter.drawText(label_x, self.sensor_y_high + sensor_circle_d//2 + 5, "High Sensor")
         # Low Level
-        painter.setBrush(QColor('#22c55e') if self.plc_state.low_level else QColor('#b0b8c1'))
-        painter.drawEllipse(sensor_x, sensor_y_low, sensor_circle_d, sensor_circle_d)
-        painter.drawText(sensor_x + sensor_circle_d + label_padding, sensor_y_low + sensor_circle_d//2 + 5, "Low Sensor")
+        painter.setBrush(COLOR_ON if low_level else COLOR_OFF)
+        painter.drawEllipse(sensor_x, self.sensor_y_low, sensor_circle_d, sensor_circle_d)
+        painter.drawText(label_x, self.sensor_y_low + sensor_circle_d//2 + 5, "Low Sensor")
         # Draw pump (below tank, left)
-        pump_x = tank_left + 30
-        pump_y = tank_top + tank_height + 40
-        pump_color = QColor('#22c55e') if self.plc_state.pump_running else QColor('#b0b8c1')
-        painter.setBrush(pump_color)
-        painter.setPen(QColor('black'))
-        painter.drawEllipse(pump_x, pump_y, 36, 36)
-        painter.setFont(QFont('Arial', 12, QFont.Bold))
-        painter.drawText(pump_x - 10, pump_y + 55, 60, 20, Qt.AlignCenter, "Pump")
+        painter.setBrush(COLOR_ON if pump_running else COLOR_OFF)
+        painter.setPen(COLOR_TEXT)
+        painter.drawEllipse(self.pump_x, self.pump_y, 36, 36)
+        painter.setFont(self.device_font)
+        painter.drawText(self.pump_x - 10, self.pump_y + 55, 60, 20, Qt.AlignCenter, "Pump")
         # Draw valve (below tank, right)
-        valve_x = tank_left + tank_width - 66
-        valve_y = tank_top + tank_height + 40
-        valve_color = QColor('#22c55e') if self.plc_state.valve_opening > 0 else QColor('#b0b8c1')
-        painter.setBrush(valve_color)
-        painter.setPen(QColor('black'))
-        painter.drawEllipse(valve_x, valve_y, 36, 36)
-        painter.drawText(valve_x - 10, valve_y + 55, 60, 20, Qt.AlignCenter, "Valve")
+        painter.setBrush(COLOR_ON if valve_open else COLOR_OFF)
+        painter.setPen(COLOR_TEXT)
+        painter.drawEllipse(self.valve_x, self.valve_y, 36, 36)
+        painter.drawText(self.valve_x - 10, self.valve_y + 55, 60, 20, Qt.AlignCenter, "Valve")
 
 class PLCApp(QWidget):
-    def __init__(self):
+    def __init__(self, max_chart=30, max_events=10, clock=None, scenario=None, state_server=None, empty_tank_popup=True):
         super().__init__()
         self.setWindowTitle("Water Tank System Simulation")
         self.setMinimumSize(950, 850)
-        self.state = PLCState()
+        self.state = PLCState(max_chart, max_events, clock, scenario)
+        self.shown_events = 0  # Number of events of the log added to log_list
+        self.shown_outputs = None  # Pump and alarm state shown by the output labels
+        self.shown_chart = None  # Versions of the chart data shown by the plots
+        self.shown_inputs = None  # Mode, valve and manual level shown by the controls
+        # Optional StateServer the state is published to after every frame
+        self.state_server = state_server
+        if state_server:
+            state_server.publish(self.state.snapshot())
         self.init_ui()
         self.timer = QTimer()
         self.timer.timeout.connect(self.update_plc)
-        self.timer.start(50)  # 50 ms scan
+        self.timer.start(50)  # 50 ms frame, see PLCState.clock for the number of scans per frame
+        # Whether to show the modal popup when the tank runs empty in auto mode
+        self.empty_tank_popup = empty_tank_popup
         self.tank_empty_popup_shown = False
 
     def init_ui(self):
@@ -257,7 +303,7 @@ class PLCApp(QWidget):
         layout.addWidget(self.plot_widget)
         layout.addWidget(log_frame)
         self.setLayout(layout)
-        self.update_manual_controls()
+        self.sync_controls()
 
     def set_input(self, name, value):
         setattr(self.state, name, value)
@@ -271,6 +317,22 @@ class PLCApp(QWidget):
         self.slider_level.setEnabled(manual_enabled)
         self.btn_valve.setEnabled(manual_enabled)
 
+    def sync_controls(self):
+        # Show the inputs of the state, e.g., preset or changed by a scenario, without
+        # triggering the handlers of the controls
+        controls = (self.radio_auto, self.radio_manual, self.slider_level, self.btn_valve)
+        for control in controls:
+            control.blockSignals(True)
+        self.radio_auto.setChecked(self.state.auto_mode)
+        self.radio_manual.setChecked(not self.state.auto_mode)
+        self.slider_level.setValue(int(self.state.manual_level))
+        self.btn_valve.setChecked(self.state.manual_valve)
+        self.btn_valve.setText("Open Valve" if self.state.manual_valve else "Close Valve")
+        for control in controls:
+            control.blockSignals(False)
+        self.update_manual_controls()
+        self.shown_inputs = (self.state.auto_mode, self.state.manual_valve, self.state.manual_level)
+
     def set_manual_level(self, value):
         self.state.manual_level = float(value)
 
@@ -279,27 +341,44 @@ class PLCApp(QWidget):
         self.btn_valve.setText("Open Valve" if self.state.manual_valve else "Close Valve")
 
     def update_plc(self):
-        self.state.scan()
+        for _ in range(self.state.clock.scans_per_frame()):
+            self.state.scan()
+        # Only widgets whose state changed are updated, e.g., setting a stylesheet makes Qt
+        # re-parse it and re-polish the widget even if it did not change
         # Outputs
-        self.lbl_pump.setText(f"Pump Running: {'ON' if self.state.pump_running else 'OFF'}")
-        self.led_pump.setStyleSheet(f"background: {'#22c55e' if self.state.pump_running else '#b0b8c1'}; border-radius: 10px; border: 1.5px solid #15803d;")
-        self.lbl_alarm.setText(f"Alarm: {'ON' if self.state.alarm else 'OFF'}")
-        self.led_alarm.setStyleSheet(f"background: {'#ef4444' if self.state.alarm else '#b0b8c1'}; border-radius: 10px; border: 1.5px solid #991b1b;")
+        outputs = (self.state.pump_running, self.state.alarm)
+        if outputs != self.shown_outputs:
+            if self.shown_outputs is None or outputs[0] != self.shown_outputs[0]:
+                self.lbl_pump.setText(f"Pump Running: {'ON' if self.state.pump_running else 'OFF'}")
+                self.led_pump.setStyleSheet(f"background: {'#22c55e' if self.state.pump_running else '#b0b8c1'}; border-radius: 10px; border: 1.5px solid #15803d;")
+            if self.shown_outputs is None or outputs[1] != self.shown_outputs[1]:
+                self.lbl_alarm.setText(f"Alarm: {'ON' if self.state.alarm else 'OFF'}")
+                self.led_alarm.setStyleSheet(f"background: {'#ef4444' if self.state.alarm else '#b0b8c1'}; border-radius: 10px; border: 1.5px solid #991b1b;")
+            self.shown_outputs = outputs
         # Tank visualization
-        self.tank_widget.update()
+        self.tank_widget.refresh()
         # Chart
-        self.plot_level.setData(self.state.chart_level)
-        self.plot_valve.setData(self.state.chart_valve)
-        # Event log
-        self.log_list.clear()
-        for event in reversed(self.state.event_log):
-            self.log_list.addItem(event)
+        chart = (self.state.chart_level.version, self.state.chart_valve.version)
+        if chart != self.shown_chart:
+            self.plot_level.setData(self.state.chart_level.values())
+            self.plot_valve.setData(self.state.chart_valve.values())
+            self.shown_chart = chart
+        # Event log (newest first), only adding events logged since the last update
+        event_log = self.state.event_log
+        new_events = min(event_log.total - self.shown_events, event_log.capacity)
+        if new_events > 0:
+            for event in event_log.values()[-new_events:]:
+                self.log_list.insertItem(0, event)
+            while self.log_list.count() > event_log.capacity:
+                self.log_list.takeItem(self.log_list.count() - 1)
+            self.shown_events = event_log.total
         # Manual controls feedback
-        if not self.state.auto_mode:
-            self.slider_level.setValue(int(self.state.manual_level))
-            self.btn_valve.setText("Open Valve" if self.state.manual_valve else "Close Valve")
+        if (self.state.auto_mode, self.state.manual_valve, self.state.manual_level) != self.shown_inputs:
+            self.sync_controls()
+        if self.state_server:
+            self.state_server.publish(self.state.snapshot())
         # Show popup if tank is empty in auto mode
-        if self.state.auto_mode and self.state.tank_level == 0.0 and not self.tank_empty_popup_shown:
+        if self.empty_tank_popup and self.state.auto_mode and self.state.tank_level == 0.0 and not self.tank_empty_popup_shown:
             self.tank_empty_popup_shown = True
             msg = QMessageBox(self)
             msg.setWindowTitle("ALARM")
@@ -313,7 +392,28 @@ class PLCApp(QWidget):
             self.tank_empty_popup_shown = False
 
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
-    win = PLCApp()
+    parser = argparse.ArgumentParser(description="Water tank system simulation")
+    parser.add_argument("--chart-history", type=int, default=30, help="Number of scans (50 ms each) shown in the chart (default: 30)")
+    parser.add_argument("--event-history", type=int, default=10, help="Number of events shown in the event log (default: 10)")
+    parser.add_argument("--speed", type=float, help="Run the simulation SPEED times as fast as real time, e.g., 10 (default: 1 or the speed of the scenario)")
+    parser.add_argument("--state-port", type=int, help="Serve the state as JSON on http://127.0.0.1:STATE_PORT (/state, /stream), e.g., 8765")
+    parser.add_argument("--scenario", help="JSON file with the initial state and scripted inputs of the simulation, see Scenario in plc_engine.py")
+    # Remaining arguments are passed on to Qt, e.g., -platform offscreen
+    args, qt_args = parser.parse_known_args()
+    app = QApplication(sys.argv[:1] + qt_args)
+    scenario = Scenario.load(args.scenario) if args.scenario else None
+    speed = args.speed or (scenario and scenario.speed)
+    clock = None
+    if speed or (scenario and scenario.start_time is not None):
+        clock = SimulationClock(speed or 1.0, scenario and scenario.start_time)
+    state_server = None
+    if args.state_port is not None:
+        state_server = StateServer(port=args.state_port)
+        state_server.start()
+        print(f"Serving PLC state on {state_server.address}/state")
+    win = PLCApp(args.chart_history, args.event_history, clock, scenario, state_server)
     win.show()
-    sys.exit(app.exec()) 
\ No newline at end of file
+    exit_code = app.exec()
+    if state_server:
+        state_server.stop()
+    sys.exit(exit_code) 
\ No newline at end of file
@@ -0,0 +1,295 @@
+import json
+import time
+from datetime import datetime
+
+import numpy as np
+
+# Events that can occur during a scan, in the order they are checked, with their log message
+EVENTS = {
+    "pump_started": "Pump started",
+    "pump_stopped_manual": "Pump stopped (manual)",
+    "pump_stopped_high": "Pump stopped (high level)",
+    "alarm_on": "Alarm ON",
+    "alarm_off": "Alarm OFF",
+}
+
+FILL_RATE = 0.5
+DRAIN_RATE = 0.2
+HIGH_LEVEL = 95
+LOW_LEVEL = 5
+ALARM_LEVEL = 98
+SCAN_INTERVAL = 0.05  # Simulated seconds per scan
+# Inputs and outputs of a tank included in snapshots
+SNAPSHOT_FIELDS = (
+    "tank_level",
+    "valve_opening",
+    "high_level",
+    "low_level",
+    "pump_running",
+    "alarm",
+    "auto_mode",
+    "manual_valve",
+    "manual_level",
+    "start_pump",
+    "stop_pump",
+)
+
+
+class RingBuffer:
+    """Fixed-capacity buffer of the latest `capacity` values backed by a preallocated NumPy array.
+
+    Appending is O(1). Each value is stored twice, `capacity` elements apart, so that the
+    buffered values are always a contiguous slice of the array and can be read in
+    insertion order without copying.
+    """
+
+    def __init__(self, capacity, dtype=float):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self._data = np.empty(2 * capacity, dtype=dtype)
+        self._next = 0
+        self._repeats = 0  # Number of latest values equal to their predecessor
+        self.total = 0  # Number of values appended since construction
+        # Incremented whenever the buffered values change, i.e., unless a value is
+        # appended to a full buffer that consists of this value only
+        self.version = 0
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def append(self, value):
+        if self.total and value == self._data[self._next - 1 + self.capacity]:
+            self._repeats += 1
+        else:
+            self._repeats = 0
+        if self.total < self.capacity or self._repeats < self.capacity:
+            self.version += 1
+        self._data[self._next] = value
+        self._data[self._next + self.capacity] = value
+        self._next = (self._next + 1) % self.capacity
+        self.total += 1
+
+    def values(self):
+        """Get the buffered values, oldest first, as read-only view that is valid until the next append."""
+        start = self._next + self.capacity - len(self)
+        view = self._data[start : self._next + self.capacity]
+        view.flags.writeable = False
+        return view
+
+
+class PLCEngine:
+    """Headless water tank simulation of `n` independent tanks.
+
+    Inputs, outputs and internal state of all tanks are stored as NumPy arrays of shape
+    `(n,)` and advanced together, with the same semantics as a scan of the PLC desktop
+    application. Inputs (`start_pump`, `stop_pump`, `auto_mode`, `manual_valve`,
+    `manual_level`) can be set per tank between steps and are held for all ticks of a
+    step, e.g., a press of Start Pump is `start_pump[i] = True`, `step()`,
+    `start_pump[i] = False`.
+    """
+
+    def __init__(self, n=1, tank_level=0.0, auto_mode=True):
+        self.n = n
+        # Inputs
+        self.start_pump = np.zeros(n, dtype=bool)
+        self.stop_pump = np.zeros(n, dtype=bool)
+        self.auto_mode = np.full(n, auto_mode, dtype=bool)
+        self.manual_valve = np.ones(n, dtype=bool)
+        self.manual_level = np.zeros(n)
+        # Outputs
+        self.tank_level = np.full(n, tank_level, dtype=float)
+        self.valve_opening = np.full(n, 100.0)
+        self.high_level = np.zeros(n, dtype=bool)
+        self.low_level = np.ones(n, dtype=bool)
+        self.pump_running = np.zeros(n, dtype=bool)
+        self.alarm = np.zeros(n, dtype=bool)
+        # Edge detection
+        self.last_start_pump = np.zeros(n, dtype=bool)
+        self.last_stop_pump = np.zeros(n, dtype=bool)
+        self.last_alarm = np.zeros(n, dtype=bool)
+        # Events of the last tick and number of events since construction per tank
+        self.events = {event: np.zeros(n, dtype=bool) for event in EVENTS}
+        self.event_counts = {event: np.zeros(n, dtype=np.int64) for event in EVENTS}
+        self.ticks = 0
+
+    def step(self, ticks=1):
+        """Advance all tanks by `ticks` scans."""
+        for _ in range(ticks):
+            self._scan()
+        self.ticks += ticks
+
+    def run_until(self, condition, max_ticks):
+        """Advance all tanks until `condition(engine)` holds for every tank, at most `max_ticks` scans.
+
+        Returns the number of ticks after which the condition first held per tank (-1 if
+        it never did).
+        """
+        reached_at = np.where(condition(self), 0, -1)
+        for tick in range(1, max_ticks + 1):
+            if (reached_at >= 0).all():
+                break
+            self.step()
+            reached_at[(reached_at < 0) & condition(self)] = tick
+        return reached_at
+
+    def snapshot(self, index=0):
+        """Get the state of tank `index` as JSON serializable dict."""
+        return {
+            "ticks": self.ticks,
+            **{name: getattr(self, name)[index].item() for name in SNAPSHOT_FIELDS},
+            "event_counts": {event: int(counts[index]) for event, counts in self.event_counts.items()},
+        }
+
+    def _scan(self):
+        # Tank simulation
+        auto = self.auto_mode
+        valve_open = self.valve_opening > 0
+        fill_rate = np.where(self.pump_running & valve_open, FILL_RATE, 0.0)
+        drain_rate = np.where(~self.pump_running & valve_open, DRAIN_RATE, 0.0)
+        auto_level = np.clip(self.tank_level + fill_rate - drain_rate, 0.0, 100.0)
+        # In manual mode, the tank level only follows the manual level if the valve is open
+        manual_level = np.where(self.manual_valve, self.manual_level, self.tank_level)
+        self.tank_level = np.where(auto, auto_level, manual_level)
+        self.valve_opening = np.where(auto | self.manual_valve, 100.0, 0.0)
+        # High/Low level sensors
+        self.high_level = self.tank_level >= HIGH_LEVEL
+        self.low_level = self.tank_level > LOW_LEVEL
+        # Pump logic
+        events = self.events
+        events["pump_started"] = (
+            self.start_pump & ~self.pump_running & ~self.high_level
+        )
+        pump_running = self.pump_running | events["pump_started"]
+        events["pump_stopped_manual"] = self.stop_pump & ~self.last_stop_pump
+        pump_running &= ~events["pump_stopped_manual"]
+        events["pump_stopped_high"] = self.high_level & pump_running
+        self.pump_running = pump_running & ~events["pump_stopped_high"]
+        self.last_start_pump = self.start_pump.copy()
+        self.last_stop_pump = self.stop_pump.copy()
+        # Alarm logic
+        self.alarm = (self.tank_level > ALARM_LEVEL) | ~self.low_level
+        events["alarm_on"] = self.alarm & ~self.last_alarm
+        events["alarm_off"] = ~self.alarm & self.last_alarm
+        self.last_alarm = self.alarm
+        for event, occurred in events.items():
+            self.event_counts[event] += occurred
+
+
+class WallClock:
+    """Clock of the real-time simulation: one scan per frame, events are logged with the wall time."""
+
+    def now(self):
+        return time.time()
+
+    def advance(self):
+        pass
+
+    def scans_per_frame(self):
+        return 1
+
+
+class SimulationClock:
+    """Clock advancing by `SCAN_INTERVAL` per scan, running `speed` times as fast as real time.
+
+    Instead of shortening the interval of frames, `speed` scans are run per frame (carrying
+    over fractions, e.g., alternating 2 and 3 scans for a speed of 2.5). Times are
+    deterministic given `start` (epoch seconds, default: now) and the number of scans.
+    """
+
+    def __init__(self, speed=1.0, start=None):
+        if speed <= 0:
+            raise ValueError("speed must be positive")
+        self.speed = speed
+        self.start = time.time() if start is None else start
+        self.scans = 0
+        self._pending_scans = 0.0
+
+    def now(self):
+        return self.start + self.scans * SCAN_INTERVAL
+
+    def advance(self):
+        """Advance the clock by one scan."""
+        self.scans += 1
+
+    def scans_per_frame(self):
+        self._pending_scans += self.speed
+        scans = int(self._pending_scans)
+        self._pending_scans -= scans
+        return scans
+
+
+class Scenario:
+    """Initial state and scripted inputs of a simulation, loaded from a JSON file like
+
+        {
+          "speed": 10,
+          "start_time": "2025-01-01T08:00:00",
+          "state": {"auto_mode": false, "manual_level": 80, "tank_level": 80},
+          "events": [
+            {"at": 1.0, "set": {"auto_mode": true}},
+            {"at": 1.5, "press": "stop_pump"}
+          ]
+        }
+
+    All keys are optional. `state` presets inputs (`STATE_INPUTS`) and the tank
+    (`STATE_FIELDS`); in manual mode with an open valve, the tank level follows
+    `manual_level`. Events happen at `at` simulated seconds after the start: `set` sets
+    inputs and `press` presses a button (`start_pump`, `stop_pump`) for one scan.
+    """
+
+    INPUTS = ("start_pump", "stop_pump", "auto_mode", "manual_valve", "manual_level")
+    BUTTONS = ("start_pump", "stop_pump")
+    STATE_FIELDS = INPUTS + ("tank_level", "pump_running")
+
+    def __init__(self, state=None, events=(), speed=None, start_time=None):
+        self.state = dict(state or {})
+        self._check_fields(self.state, self.STATE_FIELDS)
+        self.speed = speed
+        self.start_time = start_time
+        # Inputs to set before the scan of a tick by tick
+        self.actions = {}
+        for event in events:
+            tick = round(event["at"] / SCAN_INTERVAL)
+            if "press" in event:
+                button = event["press"]
+                self._check_fields({button: True}, self.BUTTONS)
+                self.actions.setdefault(tick, []).append({button: True})
+                self.actions.setdefault(tick + 1, []).append({button: False})
+            else:
+                self._check_fields(event["set"], self.INPUTS)
+                self.actions.setdefault(tick, []).append(event["set"])
+
+    @staticmethod
+    def _check_fields(values, allowed):
+        if unknown := set(values) - set(allowed):
+            raise ValueError(f"Unknown fields {sorted(unknown)}, expected any of {list(allowed)}")
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r") as f:
+            data = json.load(f)
+        start_time = data.get("start_time")
+        return cls(
+            state=data.get("state"),
+            events=data.get("events", []),
+            speed=data.get("speed"),
+            start_time=datetime.fromisoformat(start_time).timestamp() if start_time else None,
+        )
+
+    def apply_state(self, engine):
+        for name, value in self.state.items():
+            getattr(engine, name)[:] = value
+
+    def apply_actions(self, engine):
+        """Set the inputs scripted for the upcoming scan of `engine`."""
+        for action in self.actions.get(engine.ticks, ()):
+            for name, value in action.items():
+                getattr(engine, name)[:] = value
+
+    def run(self, engine, ticks):
+        """Apply the initial state to `engine`, then advance it by `ticks` scans applying all events."""
+        self.apply_state(engine)
+        for _ in range(ticks):
+            self.apply_actions(engine)
+            engine.step()
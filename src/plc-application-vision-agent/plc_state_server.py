@@ -0,0 +1,104 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+
+class StateServer:
+    """Serves snapshots of the PLC state as JSON over HTTP, by default on localhost only.
+
+    - `GET /state` returns the latest snapshot.
+    - `GET /stream` streams every published snapshot as one JSON object per line
+      (newline-delimited JSON) until the client disconnects. `?limit=N` stops after N
+      snapshots.
+
+    Snapshots are published by the application after each frame and are the only thing
+    shared with the server threads, i.e., requests never touch Qt or the simulation.
+    """
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self._snapshot = None
+        self._condition = threading.Condition()
+        self._closed = False
+        self._server = ThreadingHTTPServer((host, port), self._create_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def address(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def publish(self, snapshot):
+        """Publish a snapshot (JSON serializable dict), which must not be modified afterwards."""
+        with self._condition:
+            self._snapshot = snapshot
+            self._condition.notify_all()
+
+    def latest(self):
+        with self._condition:
+            return self._snapshot
+
+    def wait_for_next(self, snapshot, timeout=None):
+        """Wait until a snapshot other than `snapshot` is published and return it (`None` on close or timeout)."""
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self._closed or self._snapshot is not snapshot, timeout
+            )
+            if self._closed or self._snapshot is snapshot:
+                return None
+            return self._snapshot
+
+    def _create_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass  # Requests are not logged to keep the console of the app readable
+
+            def send_json_headers(self, status, content_type="application/json"):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Cache-Control", "no-store")
+                self.end_headers()
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path == "/state":
+                    body = json.dumps(server.latest()).encode("utf-8")
+                    self.send_json_headers(200)
+                    self.wfile.write(body)
+                elif url.path == "/stream":
+                    limit = int(parse_qs(url.query).get("limit", ["0"])[0])
+                    self.send_json_headers(200, "application/x-ndjson")
+                    snapshot = server.latest()
+                    sent = 0
+                    try:
+                        while not limit or sent < limit:
+                            if snapshot is not None:
+                                self.wfile.write(json.dumps(snapshot).encode("utf-8") + b"\n")
+                                self.wfile.flush()
+                                sent += 1
+                            snapshot = server.wait_for_next(snapshot)
+                            if snapshot is None:
+                                break
+                    except (BrokenPipeError, ConnectionResetError):
+                        pass  # Client disconnected
+                else:
+                    self.send_json_headers(404)
+                    self.wfile.write(json.dumps({"error": f"Unknown path {url.path}"}).encode("utf-8"))
+
+        return Handler
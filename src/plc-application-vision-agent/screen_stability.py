@@ -0,0 +1,95 @@
+import time
+
+from PIL import ImageChops
+
+from askui.models.shared.tools import Tool
+
+# Difference of a pixel in grayscale (0-255) above which it counts as changed, which
+# ignores slight color changes, e.g., of anti-aliased edges
+PIXEL_THRESHOLD = 24
+# Number of changed pixels above which the screen counts as changed. Screenshots are
+# compared at full resolution as small changes matter: in screenshots of the PLC
+# application at 1920x1080, a single digit of the tank level changes ~450 pixels.
+MIN_CHANGED_PIXELS = 10
+DEFAULT_STABLE_FOR = 0.5
+DEFAULT_TIMEOUT = 10.0
+DEFAULT_INTERVAL = 0.1
+
+
+def _grayscale(screenshot):
+    return screenshot.convert("L")
+
+
+def _is_changed(a, b):
+    if a.size != b.size:
+        return True
+    histogram = ImageChops.difference(a, b).histogram()
+    return sum(histogram[PIXEL_THRESHOLD + 1 :]) > MIN_CHANGED_PIXELS
+
+
+def wait_for_stable_screen(
+    agent,
+    stable_for=DEFAULT_STABLE_FOR,
+    timeout=DEFAULT_TIMEOUT,
+    interval=DEFAULT_INTERVAL,
+):
+    """
+    Wait until the screen has not changed for `stable_for` seconds, e.g., until a page or
+    an animation has finished loading, but at most `timeout` seconds.
+
+    Takes local screenshots every `interval` seconds and compares them with the screenshot
+    taken when the screen last changed, so that no model is called. Returns whether the
+    screen became stable before the timeout.
+    """
+    start = time.monotonic()
+    reference = _grayscale(agent.tools.os.screenshot(report=False))
+    # Screen before the last change; going back to it, e.g., due to a blinking cursor,
+    # does not count as change
+    previous = None
+    stable_since = start
+    while True:
+        now = time.monotonic()
+        if now - stable_since >= stable_for:
+            return True
+        if now - start >= timeout:
+            return False
+        time.sleep(interval)
+        current = _grayscale(agent.tools.os.screenshot(report=False))
+        if not _is_changed(reference, current):
+            continue
+        if previous is not None and not _is_changed(previous, current):
+            continue
+        previous, reference = reference, current
+        stable_since = time.monotonic()
+
+
+class WaitForStableScreenTool(Tool):
+    """
+    A tool that lets the agent wait until the screen has stopped changing, see `wait_for_stable_screen()`.
+    """
+
+    def __init__(self, agent):
+        super().__init__(
+            name="wait_for_stable_screen_tool",
+            description="Waits until the screen has stopped changing, e.g., after clicking, while a page is loading or until an opponent has made a move. Use it instead of waiting a fixed time or taking screenshots to check whether the screen is still changing.",
+            input_schema={
+                "type": "object",
+                "properties": {
+                    "stable_for": {
+                        "type": "number",
+                        "description": f"The number of seconds the screen must not change. Defaults to {DEFAULT_STABLE_FOR}.",
+                    },
+                    "timeout": {
+                        "type": "number",
+                        "description": f"The maximum number of seconds to wait. Defaults to {DEFAULT_TIMEOUT}.",
+                    },
+                },
+            },
+        )
+        self._agent = agent
+
+    def __call__(self, stable_for: float = DEFAULT_STABLE_FOR, timeout: float = DEFAULT_TIMEOUT) -> str:
+        start = time.monotonic()
+        if wait_for_stable_screen(self._agent, stable_for=stable_for, timeout=timeout):
+            return f"The screen is stable (waited {time.monotonic() - start:.1f} seconds)."
+        return f"The screen is still changing after {timeout} seconds."
@@ -1,12 +1,15 @@
 from askui import VisionAgent
 
+from screen_stability import WaitForStableScreenTool, wait_for_stable_screen
+
 # Initialize your agent context manager
 with VisionAgent() as agent:
     # Use the webbrowser tool to start browsing
     agent.tools.webbrowser.open_new("https://playtictactoe.org/")
+    wait_for_stable_screen(agent)
     agent.act("""
     
-    Everytime you make a move, wait 2 seconds before you continue. 
+    Everytime you make a move, use the wait_for_stable_screen_tool before you continue. 
     You are playing a Tic Tac Toe game as player X. Follow these strategic rules:
 
     1. First Move Strategy:
@@ -20,7 +23,7 @@ with VisionAgent() as agent:
        d) Defense: Take opposite corner if opponent has corner, or side middle if they have two corners
 
     3. Game Flow:
-       - After each move, wait for opponent's move
+       - After each move, wait for opponent's move using the wait_for_stable_screen_tool
        - Verify the opponent's move is complete before proceeding
        - If you lose click in the center of the board to reset the game.
 
@@ -35,4 +38,4 @@ with VisionAgent() as agent:
        - Check that the opponent's O appears before your next move
 
     Continue playing until explicitly stopped. Focus on winning while maintaining a strong defensive position.
-    """)
+    """, tools=[WaitForStableScreenTool(agent)])
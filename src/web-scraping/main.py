@@ -1,21 +1,101 @@
+import csv
+import json
 import time
-from askui import VisionAgent
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import ImageChops
+
+from askui import ResponseSchemaBase, VisionAgent
+
+from screen_stability import wait_for_stable_screen
+
+URL = "https://www.miinto.com/men-shirts"
+MAX_SCROLLS = 20
+SCROLL_DISTANCE = -500
+SCROLL_STABLE_FOR = 0.3
+# Number of screenshots the products are extracted from at the same time
+MAX_WORKERS = 4
+JSONL_PATH = "data.jsonl"
+CSV_PATH = "data.csv"
+
+
+class Product(ResponseSchemaBase):
+    name: str
+    price: str
+
+
+class Products(ResponseSchemaBase):
+    products: list[Product]
+
+
+def extract_products(agent, screenshot):
+    return agent.get(
+        "Extract the name and price of every product that is fully visible. "
+        "Return an empty list if there is none.",
+        response_schema=Products,
+        source=screenshot,
+    ).products
+
+
+class ProductWriter:
+    """Appends products to a JSON lines and a CSV file as they are found, skipping duplicates."""
+
+    def __init__(self, jsonl_path, csv_path):
+        self._jsonl_file = open(jsonl_path, "w", encoding="utf-8")
+        self._csv_file = open(csv_path, "w", encoding="utf-8", newline="")
+        self._csv_writer = csv.DictWriter(self._csv_file, fieldnames=list(Product.model_fields))
+        self._csv_writer.writeheader()
+        self._seen = set()
+
+    def write(self, products):
+        for product in products:
+            # Products at the border of the viewport are seen after scrolling again
+            key = tuple(" ".join(value.split()).casefold() for value in (product.name, product.price))
+            if key in self._seen:
+                continue
+            self._seen.add(key)
+            record = product.model_dump()
+            self._jsonl_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._csv_writer.writerow(record)
+        self._jsonl_file.flush()
+        self._csv_file.flush()
+
+    @property
+    def count(self):
+        return len(self._seen)
+
+    def close(self):
+        self._jsonl_file.close()
+        self._csv_file.close()
+
 
 with VisionAgent() as agent:
-        agent.tools.webbrowser.open_new("https://www.miinto.com/men-shirts")
-        time.sleep(5)
-        extracted_products = []
-    
-        for _ in range(5):
-            agent.mouse_scroll(0, -500)
-            product = agent.get(
-                'Extract only the product name and price in the format: {"name": "Product Name", "price": "$price"}. '
-                'If no product is found, return null.'
-            )
-            if product:
-                extracted_products.append(product)
-                break
-    
-
-        with open("data.txt", "w", encoding="utf-8") as file:
-           file.writelines(extracted_products)
+    agent.tools.webbrowser.open_new(URL)
+    wait_for_stable_screen(agent)
+    start = time.perf_counter()
+    writer = ProductWriter(JSONL_PATH, CSV_PATH)
+
+    # Scrolling and taking screenshots is fast, extracting the products from them is
+    # slow: screenshots are extracted in the background while scrolling on and written
+    # in the order they were taken as soon as all earlier ones are done
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        extractions = []
+        screenshot_count = 0
+        previous_screenshot = None
+        for _ in range(MAX_SCROLLS + 1):
+            screenshot = agent.tools.os.screenshot(report=False)
+            if previous_screenshot is not None and not ImageChops.difference(screenshot, previous_screenshot).getbbox():
+                break  # The page did not move, i.e., its end is reached
+            extractions.append(executor.submit(extract_products, agent, screenshot))
+            screenshot_count += 1
+            while extractions and extractions[0].done():
+                writer.write(extractions.pop(0).result())
+            previous_screenshot = screenshot
+            agent.mouse_scroll(0, SCROLL_DISTANCE)
+            # Wait for smooth scrolling and lazily loaded images
+            wait_for_stable_screen(agent, stable_for=SCROLL_STABLE_FOR)
+        for extraction in extractions:
+            writer.write(extraction.result())
+
+    writer.close()
+    print(f"Saved {writer.count} products from {screenshot_count} screenshots to {JSONL_PATH} and {CSV_PATH} in {time.perf_counter() - start:.1f}s")